@@ -4,40 +4,43 @@ Run the server first: uvicorn app.main:app --reload
 Then run: python test_api.py
 """
 
-import requests
+import asyncio
+import httpx
 
 BASE_URL = "http://localhost:8000"
 
+# Shared keep-alive pool for every test
+LIMITS = httpx.Limits(max_connections=8, max_keepalive_connections=4)
 
-def test_health():
+
+async def test_health(client: httpx.AsyncClient):
     """Test health endpoint."""
+    r = await client.get("/")
     print("\n1. Testing health endpoint...")
-    r = requests.get(f"{BASE_URL}/")
     print(f"   Status: {r.status_code}")
     print(f"   Response: {r.json()}")
     return r.status_code == 200
 
 
-def test_stats():
+async def test_stats(client: httpx.AsyncClient):
     """Test stats endpoint."""
+    r = await client.get("/stats")
     print("\n2. Testing stats endpoint...")
-    r = requests.get(f"{BASE_URL}/stats")
     print(f"   Status: {r.status_code}")
     print(f"   Response: {r.json()}")
     return r.status_code == 200
 
 
-def test_readability():
+async def test_readability(client: httpx.AsyncClient):
     """Test readability analysis."""
-    print("\n3. Testing readability endpoint...")
-    
     complex_text = """
     The patient presents with acute exacerbation of chronic obstructive 
     pulmonary disease, characterized by increased dyspnea and decreased 
     exercise tolerance. Treatment includes bronchodilators and supplemental oxygen.
     """
     
-    r = requests.post(f"{BASE_URL}/readability", json={"text": complex_text})
+    r = await client.post("/readability", json={"text": complex_text})
+    print("\n3. Testing readability endpoint...")
     print(f"   Status: {r.status_code}")
     data = r.json()
     print(f"   Grade Level: {data['readability']['avg_grade_level']:.1f}")
@@ -46,25 +49,26 @@ def test_readability():
     return r.status_code == 200
 
 
-def test_upload_sample():
+async def test_upload_sample(client: httpx.AsyncClient):
     """Test PDF upload with a sample file."""
-    print("\n4. Testing PDF upload...")
-    
     # Check if sample PDF exists
     import os
     sample_path = "data/sample_docs/sample.pdf"
     
     if not os.path.exists(sample_path):
+        print("\n4. Testing PDF upload...")
         print(f"   ⚠ No sample PDF found at {sample_path}")
         print("   Create a sample PDF or skip this test")
         return True  # Skip but don't fail
     
+    # httpx streams file fields from disk in chunks rather than buffering the whole PDF
     with open(sample_path, "rb") as f:
-        r = requests.post(
-            f"{BASE_URL}/upload",
+        r = await client.post(
+            "/upload",
             files={"file": ("sample.pdf", f, "application/pdf")}
         )
     
+    print("\n4. Testing PDF upload...")
     print(f"   Status: {r.status_code}")
     if r.status_code == 200:
         data = r.json()
@@ -74,18 +78,17 @@ def test_upload_sample():
     return r.status_code == 200
 
 
-def test_ask_question():
+async def test_ask_question(client: httpx.AsyncClient):
     """Test question answering."""
-    print("\n5. Testing question endpoint...")
-    
     # First check if we have documents
-    stats = requests.get(f"{BASE_URL}/stats").json()
+    stats = (await client.get("/stats")).json()
     if stats["total_chunks"] == 0:
+        print("\n5. Testing question endpoint...")
         print("   ⚠ No documents indexed, skipping question test")
         return True
     
-    r = requests.post(
-        f"{BASE_URL}/ask",
+    r = await client.post(
+        "/ask",
         json={
             "question": "What medications should I take?",
             "use_simplifier": False,  # Set True to test LLM
@@ -93,6 +96,7 @@ def test_ask_question():
         }
     )
     
+    print("\n5. Testing question endpoint...")
     print(f"   Status: {r.status_code}")
     if r.status_code == 200:
         data = r.json()
@@ -102,7 +106,7 @@ def test_ask_question():
     return r.status_code == 200
 
 
-def test_simplify():
+async def test_simplify(client: httpx.AsyncClient):
     """Test text simplification (requires LLM)."""
     print("\n6. Testing simplify endpoint (loads LLM on first call)...")
     print("   ⚠ This may take a minute on first run...")
@@ -115,8 +119,8 @@ def test_simplify():
     """
     
     try:
-        r = requests.post(
-            f"{BASE_URL}/simplify",
+        r = await client.post(
+            "/simplify",
             json={"text": text},
             timeout=120  # Long timeout for LLM loading
         )
@@ -129,34 +133,39 @@ def test_simplify():
             print(f"   Improvement: {data['improvement']['grade_level_reduction']:.1f} grades")
             print(f"   Simplified text: {data['simplified'][:150]}...")
         return r.status_code == 200
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         print("   ⚠ Request timed out (LLM may still be loading)")
         return True
 
 
-def main():
+async def run_tests():
     print("=" * 60)
     print("PATIENT COMMUNICATION ASSISTANT - API TESTS")
     print("=" * 60)
     print(f"Testing against: {BASE_URL}")
     
-    # Check if server is running
-    try:
-        requests.get(BASE_URL, timeout=5)
-    except requests.exceptions.ConnectionError:
-        print("\n❌ Server not running!")
-        print("   Start it with: uvicorn app.main:app --reload")
-        return
-    
-    results = []
-    results.append(("Health", test_health()))
-    results.append(("Stats", test_stats()))
-    results.append(("Readability", test_readability()))
-    results.append(("Upload", test_upload_sample()))
-    results.append(("Ask", test_ask_question()))
-    
-    # Uncomment to test LLM simplification:
-    # results.append(("Simplify", test_simplify()))
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=LIMITS, timeout=120) as client:
+        # Check if server is running
+        try:
+            await client.get("/", timeout=5)
+        except httpx.ConnectError:
+            print("\n❌ Server not running!")
+            print("   Start it with: uvicorn app.main:app --reload")
+            return
+        
+        # Independent tests run concurrently; Ask needs the upload to have finished
+        names = ["Health", "Stats", "Readability", "Upload"]
+        passed = await asyncio.gather(
+            test_health(client),
+            test_stats(client),
+            test_readability(client),
+            test_upload_sample(client),
+        )
+        results = list(zip(names, passed))
+        results.append(("Ask", await test_ask_question(client)))
+        
+        # Uncomment to test LLM simplification:
+        # results.append(("Simplify", await test_simplify(client)))
     
     print("\n" + "=" * 60)
     print("RESULTS")
@@ -168,5 +177,9 @@ def main():
     print("\n✅ API tests complete!")
 
 
+def main():
+    asyncio.run(run_tests())
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -10,10 +10,10 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from app.ingestion.pdf_loader import LoadedDocument, DocumentMetadata
-from app.ingestion.chunker import MedicalTextChunker
+from app.ingestion.chunker import get_chunker
 from app.retrieval.vector_store import VectorStore
 from app.retrieval.embeddings import get_embedding_model
-from app.evaluation.readability import ReadabilityScorer, check_readability
+from app.evaluation.readability import ReadabilityScorer
 
 
 def create_sample_document() -> LoadedDocument:
@@ -79,13 +79,13 @@ def test_readability_only():
     oxygen levels are low. We'll give you medicine to help you breathe better.
     """
     
+    complex_score, simple_score = scorer.score_batch([complex_text, simple_text])
+    
     print("\n📊 Complex Medical Text:")
-    complex_score = scorer.score(complex_text)
     print(f"   Grade Level: {complex_score.avg_grade_level:.1f}")
     print(f"   Patient-friendly: {complex_score.is_patient_friendly}")
     
     print("\n📊 Simplified Text:")
-    simple_score = scorer.score(simple_text)
     print(f"   Grade Level: {simple_score.avg_grade_level:.1f}")
     print(f"   Patient-friendly: {simple_score.is_patient_friendly}")
     
@@ -104,7 +104,7 @@ def test_retrieval_pipeline():
     
     # Create document and chunks
     doc = create_sample_document()
-    chunker = MedicalTextChunker(chunk_size=200, chunk_overlap=30)
+    chunker = get_chunker(chunk_size=200, chunk_overlap=30)
     chunks = chunker.chunk_document(doc)
     print(f"\n✓ Created {len(chunks)} chunks")
     
@@ -156,7 +156,7 @@ def test_full_rag_pipeline():
     
     # Set up retrieval
     doc = create_sample_document()
-    chunker = MedicalTextChunker(chunk_size=200, chunk_overlap=30)
+    chunker = get_chunker(chunk_size=200, chunk_overlap=30)
     chunks = chunker.chunk_document(doc)
     
     embedding_model = get_embedding_model(use_preset="fast")
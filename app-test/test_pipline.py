@@ -10,7 +10,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from app.ingestion.pdf_loader import LoadedDocument, DocumentMetadata
-from app.ingestion.chunker import MedicalTextChunker
+from app.ingestion.chunker import get_chunker
 from app.retrieval.embeddings import get_embedding_model
 from app.retrieval.vector_store import VectorStore
 
@@ -121,7 +121,7 @@ def test_chunking():
     print("="*60)
     
     doc = create_sample_document()
-    chunker = MedicalTextChunker(chunk_size=200, chunk_overlap=30)
+    chunker = get_chunker(chunk_size=200, chunk_overlap=30)
     chunks = chunker.chunk_document(doc)
     
     print(f"\nDocument: {doc.metadata.source_file}")
@@ -1,20 +1,35 @@
 """Application configuration and settings."""
 
-from pydantic_settings import BaseSettings
-from pydantic import Field
+from functools import lru_cache
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic import Field, ValidationInfo, field_validator
 from pathlib import Path
 
 
 class Settings(BaseSettings):
-    """Application settings loaded from environment variables."""
+    """Application settings loaded from environment variables (immutable once loaded)."""
+    
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", frozen=True)
     
     # API Keys
-    openai_api_key: str = Field(default="", env="OPENAI_API_KEY")
+    openai_api_key: str = Field(default="", validation_alias="OPENAI_API_KEY")
     
     # Paths
     base_dir: Path = Path(__file__).parent.parent
-    data_dir: Path = base_dir / "data"
-    vector_store_dir: Path = data_dir / "vector_store"
+    
+    # Overridable via DATA_DIR / VECTOR_STORE_DIR; derived from base_dir when unset
+    data_dir: Optional[Path] = Field(default=None, validate_default=True)
+    vector_store_dir: Optional[Path] = Field(default=None, validate_default=True)
+    
+    @field_validator("data_dir", "vector_store_dir")
+    @classmethod
+    def _default_dirs(cls, value: Optional[Path], info: ValidationInfo) -> Path:
+        if value is not None:
+            return value
+        if info.field_name == "data_dir":
+            return info.data["base_dir"] / "data"
+        return info.data["data_dir"] / "vector_store"
     
     # Chunking settings
     chunk_size: int = 512
@@ -22,17 +37,28 @@ class Settings(BaseSettings):
     
     # Embedding settings
     embedding_model: str = "text-embedding-3-small"
+    embedding_backend: str = "torch"  # 'onnx' for int8 ONNX Runtime on CPU servers
     
     # Generation settings
     generation_model: str = "gpt-4o-mini"
     target_reading_level: int = 8
+    preload_simplifier: bool = True  # Load the LLM at startup (disable to load on first use and save memory)
+    
+    # LLM response cache
+    llm_cache_enabled: bool = True
+    llm_cache_threshold: float = 0.92
+    llm_cache_ttl: int = 3600
+    llm_exact_cache_size: int = 1024
     
     # Vector store
     collection_name: str = "discharge_docs"
-    
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+    vector_quantization: str = "none"  # 'pq' (16x smaller) or 'binary' (32x smaller)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide settings instance."""
+    return Settings()
 
 
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
@@ -0,0 +1,33 @@
+"""Memoized syllable counting for readability scoring."""
+
+from functools import lru_cache
+from typing import Iterable
+import textstat
+
+
+# High-syllable terms that recur across discharge summaries and medication guides
+MEDICAL_TERMS = (
+    "acetaminophen", "acidosis", "administration", "anticoagulant", "antibiotic",
+    "appointment", "arrhythmia", "arterial", "bronchodilator", "cardiac",
+    "cardiovascular", "characterized", "chronic", "complication", "dyspnea",
+    "echocardiogram", "electrocardiogram", "emergency", "endoscopy", "esophageal",
+    "esophagus", "exacerbation", "gastroesophageal", "gastrointestinal", "hemoglobin",
+    "hospitalization", "hypertension", "hypoglycemia", "hypoxemia", "ibuprofen",
+    "immediately", "infection", "inflammation", "inhibitor", "insulin",
+    "intravenous", "medication", "metoprolol", "myocardial", "naproxen",
+    "obstructive", "omeprazole", "prescription", "procedure", "productive",
+    "pulmonary", "purulent", "respiratory", "secretion", "supplemental",
+    "symptoms", "tolerance", "treatment", "ultrasound", "vaccination",
+)
+
+
+@lru_cache(maxsize=65536)
+def syllables(word: str) -> int:
+    """Syllable count for a single word."""
+    return textstat.syllable_count(word.lower())
+
+
+def preload(words: Iterable[str] = MEDICAL_TERMS) -> None:
+    """Warm the syllable cache, e.g. with the medical vocabulary at startup."""
+    for word in words:
+        syllables(word)
@@ -1,10 +1,98 @@
 """Readability scoring for patient-friendly text verification."""
 
+import re
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import Optional
+import numpy as np
 import textstat
 
+from ._syllables import syllables
+
+
+# Tokenization mirrors textstat's English defaults, so scores match textstat exactly:
+# words are whitespace-separated tokens with at least one word character (punctuation,
+# apostrophes included, is stripped), letters are word characters, and sentences are
+# runs up to terminal punctuation
+_WORD_CHAR_RE = re.compile(r"\w")
+_NON_WORD_CHAR_RE = re.compile(r"\W")
+_SENTENCE_RE = re.compile(r"\b[^.!?]+[.!?]*")
+_DIFFICULT_CANDIDATE_RE = re.compile(r"[\w\='‘’]+")
+_TOKEN_RE = re.compile(r"\S+")
+
+# Texts with fewer whitespace-separated tokens than this get the short-text score
+_MIN_SCORABLE_TOKENS = 10
+
+# textstat's English syllable threshold for Gunning Fog's difficult words
+_DIFFICULT_SYLLABLES = 3
+
+
+def _is_too_short(text: str) -> bool:
+    """True if text has fewer than _MIN_SCORABLE_TOKENS tokens, stopping once it has enough."""
+    if not text:
+        return True
+    tokens = islice(_TOKEN_RE.finditer(text), _MIN_SCORABLE_TOKENS)
+    return sum(1 for _ in tokens) < _MIN_SCORABLE_TOKENS
+
+
+@lru_cache(maxsize=65536)
+def _is_difficult(word: str) -> bool:
+    """Not on the Dale-Chall easy list and 3+ syllables (textstat's difficult word)."""
+    return textstat.is_difficult_word(word, _DIFFICULT_SYLLABLES)
+
+
+def _legacy_round(values: np.ndarray, points: int) -> np.ndarray:
+    """textstat's rounding (half away from zero), applied elementwise."""
+    p = 10 ** points
+    return np.floor(values * p + np.copysign(0.5, values)) / p
+
 
 @dataclass
+class _TextStats:
+    """Shared primitives every readability formula is derived from."""
+    word_count: int
+    sentence_count: int
+    syllable_count: int
+    letter_count: int
+    polysyllable_count: int         # Words with 3+ syllables (SMOG)
+    difficult_word_count: int       # Distinct non-easy words with 3+ syllables (Gunning Fog)
+
+
+def _text_stats(text: str) -> _TextStats:
+    """Split words and sentences and count syllables once per text."""
+    word_count = syllable_count = polysyllables = 0
+    for word in text.split():
+        if not _WORD_CHAR_RE.search(word):
+            continue
+        word_syllables = syllables(word)
+        word_count += 1
+        syllable_count += word_syllables
+        if word_syllables >= 3:
+            polysyllables += 1
+    
+    # Like textstat, fragments of 2 words or fewer don't count as sentences
+    sentence_count = 0
+    for sentence in _SENTENCE_RE.findall(text):
+        words = sum(1 for word in sentence.split() if _WORD_CHAR_RE.search(word))
+        if words > 2:
+            sentence_count += 1
+    
+    candidates = set(_DIFFICULT_CANDIDATE_RE.findall(text.lower()))
+    
+    return _TextStats(
+        word_count=word_count,
+        sentence_count=max(1, sentence_count),
+        syllable_count=syllable_count,
+        letter_count=len(_NON_WORD_CHAR_RE.sub("", text)),
+        polysyllable_count=polysyllables,
+        difficult_word_count=sum(1 for word in candidates if _is_difficult(word)),
+    )
+
+
+@dataclass(frozen=True)
 class ReadabilityScore:
     """Container for readability metrics."""
     flesch_reading_ease: float      # 0-100, higher = easier (target: 60-70)
@@ -58,60 +146,132 @@ class ReadabilityScorer:
     Uses multiple formulas and averages them for robust grade-level estimate.
     """
     
-    def __init__(self, target_grade_level: float = 8.0):
+    def __init__(self, target_grade_level: float = 8.0, cache_size: int = 1024):
         self.target_grade_level = target_grade_level
+        # LRU of scores keyed by text (str caches its own hash, so lookups don't rescan)
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, ReadabilityScore] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
     
     def score(self, text: str) -> ReadabilityScore:
-        """Calculate readability scores for text."""
-        # Handle empty or very short text
-        if not text or len(text.split()) < 10:
-            return ReadabilityScore(
-                flesch_reading_ease=100.0,
-                flesch_kincaid_grade=0.0,
-                gunning_fog=0.0,
-                smog_index=0.0,
-                coleman_liau_index=0.0,
-                avg_grade_level=0.0,
-                is_patient_friendly=True,
-                word_count=len(text.split()) if text else 0,
-                sentence_count=textstat.sentence_count(text) if text else 0,
-                avg_words_per_sentence=0.0
-            )
+        """Calculate readability scores for text (memoized for repeated inputs)."""
+        return self.score_batch([text])[0]
+    
+    def score_batch(self, texts: list[str]) -> list[ReadabilityScore]:
+        """
+        Calculate readability scores for several texts at once.
         
-        # Calculate individual scores
-        flesch_ease = textstat.flesch_reading_ease(text)
-        flesch_grade = textstat.flesch_kincaid_grade(text)
-        fog = textstat.gunning_fog(text)
-        smog = textstat.smog_index(text)
-        coleman = textstat.coleman_liau_index(text)
+        Each text is tokenized once into per-document counts, then all five
+        formulas are evaluated as NumPy array ops across the whole batch.
+        """
+        results: list[Optional[ReadabilityScore]] = [None] * len(texts)
         
-        # Calculate average grade level
-        grade_scores = [flesch_grade, fog, smog, coleman]
-        valid_scores = [s for s in grade_scores if 0 <= s <= 20]
-        avg_grade = sum(valid_scores) / len(valid_scores) if valid_scores else 0
+        # Reuse cached scores, handle empty or very short text
+        long_indices = []
+        hits = 0
+        with self._lock:
+            for i, text in enumerate(texts):
+                cached = self._cache.get(text)
+                if cached is not None:
+                    self._cache.move_to_end(text)
+                    results[i] = cached
+                    hits += 1
+                elif _is_too_short(text):
+                    results[i] = self._short_text_score(text)
+                else:
+                    long_indices.append(i)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(long_indices)
         
-        # Text stats
-        word_count = textstat.lexicon_count(text, removepunct=True)
-        sentence_count = textstat.sentence_count(text)
-        avg_words_sentence = word_count / sentence_count if sentence_count > 0 else 0
+        if not long_indices:
+            return results
+        
+        # Compute shared primitives once per text, stacked into one array per count
+        all_stats = [_text_stats(texts[i]) for i in long_indices]
+        counts = np.array(
+            [
+                (s.word_count, s.sentence_count, s.syllable_count, s.letter_count,
+                 s.polysyllable_count, s.difficult_word_count)
+                for s in all_stats
+            ],
+            dtype=np.float64,
+        )
+        word_count, sentence_count, syllable_count, letter_count, polysyllables, difficult = counts.T
+        # Same operation order and intermediate rounding as textstat; texts with no
+        # words score 0 wherever textstat hits a division by zero
+        has_words = word_count > 0
+        words = np.maximum(word_count, 1)
+        words_per_sentence = word_count / sentence_count
+        sentence_length = _legacy_round(words_per_sentence, 1)
+        syllables_per_word = _legacy_round(syllable_count / words, 1)
+        
+        flesch_ease = _legacy_round(206.835 - 1.015 * sentence_length - 84.6 * syllables_per_word, 2)
+        flesch_grade = _legacy_round(0.39 * sentence_length + 11.8 * syllables_per_word - 15.59, 1)
+        fog = np.where(has_words, _legacy_round(0.4 * (sentence_length + difficult / words * 100), 2), 0.0)
+        smog = np.where(
+            sentence_count >= 3,
+            _legacy_round(1.043 * (30 * (polysyllables / sentence_count)) ** .5 + 3.1291, 1),
+            0.0,
+        )
+        letters = _legacy_round(np.where(has_words, _legacy_round(letter_count / words, 2), 0.0) * 100, 2)
+        sentences = _legacy_round(np.where(has_words, _legacy_round(sentence_count / words, 2), 0.0) * 100, 2)
+        coleman = _legacy_round(0.058 * letters - 0.296 * sentences - 15.8, 2)
         
+        # Average grade level over the in-range (0-20) grade metrics, one masked mean per row
+        grades = np.column_stack([flesch_grade, fog, smog, coleman])
+        valid = (grades >= 0) & (grades <= 20)
+        valid_counts = valid.sum(axis=1)
+        avg_grades = np.where(
+            valid_counts > 0,
+            (grades * valid).sum(axis=1) / np.maximum(valid_counts, 1),
+            0.0,
+        )
+        
+        for row, i in enumerate(long_indices):
+            avg_grade = float(avg_grades[row])
+            results[i] = ReadabilityScore(
+                flesch_reading_ease=float(flesch_ease[row]),
+                flesch_kincaid_grade=float(flesch_grade[row]),
+                gunning_fog=float(fog[row]),
+                smog_index=float(smog[row]),
+                coleman_liau_index=float(coleman[row]),
+                avg_grade_level=avg_grade,
+                is_patient_friendly=avg_grade <= self.target_grade_level,
+                word_count=all_stats[row].word_count,
+                sentence_count=all_stats[row].sentence_count,
+                avg_words_per_sentence=float(words_per_sentence[row])
+            )
+            self._remember(texts[i], results[i])
+        
+        return results
+    
+    def _remember(self, text: str, score: ReadabilityScore):
+        """Add a score to the LRU cache, evicting the least recently used."""
+        with self._lock:
+            self._cache[text] = score
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _short_text_score(self, text: str) -> ReadabilityScore:
+        """Score for empty or very short text, which the formulas can't rate."""
         return ReadabilityScore(
-            flesch_reading_ease=flesch_ease,
-            flesch_kincaid_grade=flesch_grade,
-            gunning_fog=fog,
-            smog_index=smog,
-            coleman_liau_index=coleman,
-            avg_grade_level=avg_grade,
-            is_patient_friendly=avg_grade <= self.target_grade_level,
-            word_count=word_count,
-            sentence_count=sentence_count,
-            avg_words_per_sentence=avg_words_sentence
+            flesch_reading_ease=100.0,
+            flesch_kincaid_grade=0.0,
+            gunning_fog=0.0,
+            smog_index=0.0,
+            coleman_liau_index=0.0,
+            avg_grade_level=0.0,
+            is_patient_friendly=True,
+            word_count=len(text.split()) if text else 0,
+            sentence_count=textstat.sentence_count(text) if text else 0,
+            avg_words_per_sentence=0.0
         )
     
     def compare(self, original: str, simplified: str) -> dict:
         """Compare readability of original vs simplified text."""
-        original_score = self.score(original)
-        simplified_score = self.score(simplified)
+        original_score, simplified_score = self.score_batch([original, simplified])
         
         grade_improvement = original_score.avg_grade_level - simplified_score.avg_grade_level
         ease_improvement = simplified_score.flesch_reading_ease - original_score.flesch_reading_ease
@@ -142,10 +302,15 @@ Words/Sentence: {original.avg_words_per_sentence:.1f} → {simplified.avg_words_
 """
 
 
+@lru_cache(maxsize=8)
+def _get_scorer(target_grade: float) -> ReadabilityScorer:
+    """Shared scorer per target grade, so its score cache persists across calls."""
+    return ReadabilityScorer(target_grade_level=target_grade)
+
+
 def check_readability(text: str, target_grade: float = 8.0) -> ReadabilityScore:
     """Quick function to check readability of text."""
-    scorer = ReadabilityScorer(target_grade_level=target_grade)
-    return scorer.score(text)
+    return _get_scorer(target_grade).score(text)
 
 
 def is_patient_friendly(text: str, target_grade: float = 8.0) -> bool:
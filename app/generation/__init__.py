@@ -1,12 +1,29 @@
 """Generation module for medical text simplification."""
 
 from .simplifier import MedicalSimplifier, create_simplifier
-from .prompts import SYSTEM_PROMPT, SIMPLIFY_PROMPT, ANSWER_PROMPT
+from .cache import LLMCache, ExactCache, SemanticLLMCache, CacheBackend, MemoryBackend, cache_key
+from .prompts import (
+    SYSTEM_PROMPT,
+    SIMPLIFY_PROMPT,
+    ANSWER_PROMPT,
+    render_simplify,
+    render_answer,
+    render_readability_check,
+)
 
 __all__ = [
     "MedicalSimplifier",
     "create_simplifier",
+    "LLMCache",
+    "ExactCache",
+    "SemanticLLMCache",
+    "CacheBackend",
+    "MemoryBackend",
+    "cache_key",
     "SYSTEM_PROMPT",
     "SIMPLIFY_PROMPT",
     "ANSWER_PROMPT",
+    "render_simplify",
+    "render_answer",
+    "render_readability_check",
 ]
@@ -0,0 +1,319 @@
+"""Response caching for LLM generation calls."""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Protocol
+import numpy as np
+
+
+@dataclass
+class CacheEntry:
+    """A cached LLM response."""
+    response: str
+    created_at: float
+
+
+class CacheBackend(Protocol):
+    """Storage for cached responses, keyed by an opaque string."""
+
+    def get(self, key: str) -> Optional[CacheEntry]: ...
+
+    def set(self, key: str, entry: CacheEntry) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryBackend:
+    """In-process dictionary backend."""
+
+    def __init__(self):
+        self._entries: dict[str, CacheEntry] = {}
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self._entries.get(key)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def cache_key(
+    model: str,
+    messages: list[dict],
+    temperature: float,
+    tools: Optional[list[dict]] = None
+) -> Optional[str]:
+    """
+    Exact-match key for a generation call.
+
+    Returns None for sampled (temperature > 0) calls, whose output isn't
+    deterministic and so shouldn't be replayed from cache.
+    """
+    if temperature > 0:
+        return None
+    payload = {"model": model, "messages": messages, "temperature": temperature, "tools": tools or []}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class ExactCache:
+    """Bounded LRU of responses keyed by `cache_key`."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+            return response
+
+    def set(self, key: str, response: str):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: returns (int8 values, float32 row scales)."""
+    vectors = np.atleast_2d(vectors)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class _VectorIndex:
+    """Row-aligned keys and int8-quantized unit embeddings for one namespace."""
+
+    def __init__(self, dimensions: int):
+        self.keys: list[str] = []
+        self.quantized = np.empty((0, dimensions), dtype=np.int8)
+        self.scales = np.empty(0, dtype=np.float32)
+
+    def add(self, key: str, embedding: np.ndarray):
+        quantized, scales = _quantize_int8(embedding)
+        self.keys.append(key)
+        self.quantized = np.vstack([self.quantized, quantized])
+        self.scales = np.concatenate([self.scales, scales])
+
+    def remove(self, key: str):
+        row = self.keys.index(key)
+        del self.keys[row]
+        self.quantized = np.delete(self.quantized, row, axis=0)
+        self.scales = np.delete(self.scales, row)
+
+    def best_match(self, query: np.ndarray) -> tuple[Optional[str], float]:
+        if not self.keys:
+            return None, 0.0
+        # One integer GEMV (int32 accumulate) against every cached entry, then rescale
+        query_q8, query_scale = _quantize_int8(query)
+        dots = self.quantized.astype(np.int32) @ query_q8[0].astype(np.int32)
+        scores = dots.astype(np.float32) * self.scales * query_scale[0]
+        row = int(np.argmax(scores))
+        return self.keys[row], float(scores[row])
+
+
+class SemanticLLMCache:
+    """
+    Cache that returns a stored LLM response when a new input is
+    semantically close to one already answered.
+
+    Inputs are embedded with `embed_fn` and compared by cosine similarity
+    against previous inputs in the same namespace (e.g. "answer:<context>").
+    `max_entries` bounds the whole cache, across namespaces; expired entries
+    are dropped as new ones arrive, and a namespace goes once it is empty.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], np.ndarray],
+        backend: Optional[CacheBackend] = None,
+        threshold: float = 0.92,
+        ttl: float = 3600,
+        max_entries: int = 1024,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            embed_fn: Function mapping text to an embedding vector
+            backend: Response storage (in-memory if None)
+            threshold: Minimum cosine similarity to count as a hit
+            ttl: Seconds before an entry expires
+            max_entries: Max entries across all namespaces (oldest evicted first)
+        """
+        self.embed_fn = embed_fn
+        self.backend = backend or MemoryBackend()
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._indexes: dict[str, _VectorIndex] = {}
+        # Every stored key -> (namespace, created_at), oldest first
+        self._order: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+        # Keys and their index rows change together; lookups must never see them half-updated
+        self._lock = threading.Lock()
+
+    def get(self, text: str, namespace: str = "default") -> Optional[str]:
+        """Return a cached response for text (or a near-duplicate), if any."""
+        # Embed outside the lock; only the index lookup and bookkeeping are serialised
+        embedding = self._embed(text) if namespace in self._indexes else None
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None or embedding is None:
+                self.stats["misses"] += 1
+                return None
+
+            key, similarity = index.best_match(embedding)
+            entry = self.backend.get(key) if key and similarity >= self.threshold else None
+
+            if entry and time.time() - entry.created_at > self.ttl:
+                self._evict(namespace, key)
+                entry = None
+
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            self.stats["hits"] += 1
+            return entry.response
+
+    def set(self, text: str, response: str, namespace: str = "default"):
+        """Store the response generated for text."""
+        key = self._key(namespace, text)
+        embedding = self._embed(text)
+        now = time.time()
+        with self._lock:
+            if key in self._order:
+                self._evict(namespace, key)
+            # Oldest entries go first: anything expired, then whatever exceeds the cap
+            while self._order:
+                oldest, (oldest_namespace, created_at) = next(iter(self._order.items()))
+                if now - created_at <= self.ttl and len(self._order) < self.max_entries:
+                    break
+                self._evict(oldest_namespace, oldest)
+
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = _VectorIndex(len(embedding))
+            index.add(key, embedding)
+            self._order[key] = (namespace, now)
+            self.backend.set(key, CacheEntry(response=response, created_at=now))
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._indexes.clear()
+            self._order.clear()
+            self.backend.clear()
+
+    def _embed(self, text: str) -> np.ndarray:
+        # EmbeddingModel already returns unit vectors; this keeps arbitrary embed_fns safe
+        embedding = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def _evict(self, namespace: str, key: str):
+        # Caller holds self._lock
+        index = self._indexes[namespace]
+        index.remove(key)
+        if not index.keys:
+            del self._indexes[namespace]
+        self._order.pop(key, None)
+        self.backend.delete(key)
+
+    @staticmethod
+    def _key(namespace: str, text: str) -> str:
+        return f"{namespace}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+
+class LLMCache:
+    """
+    Layered response cache: exact match → semantic match → LLM.
+
+    The exact layer is an O(1) lookup on the full prompt, so it's checked
+    before paying for an embedding pass in the semantic layer.
+    """
+
+    def __init__(
+        self,
+        exact: Optional[ExactCache] = None,
+        semantic: Optional[SemanticLLMCache] = None,
+    ):
+        self.exact = exact
+        self.semantic = semantic
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        # Guards the counters; each layer locks its own storage
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        key: Optional[str],
+        text: str,
+        namespace: str = "default",
+        semantic: bool = True
+    ) -> Optional[str]:
+        """
+        Look up a response by exact key first, then by semantic similarity of text.
+
+        Pass semantic=False for inputs where a near-duplicate isn't good enough.
+        """
+        if self.exact and key:
+            response = self.exact.get(key)
+            if response is not None:
+                self._count("exact_hits")
+                return response
+
+        if self.semantic and semantic:
+            response = self.semantic.get(text, namespace=namespace)
+            if response is not None:
+                self._count("semantic_hits")
+                return response
+
+        self._count("misses")
+        return None
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def set(
+        self,
+        key: Optional[str],
+        text: str,
+        response: str,
+        namespace: str = "default",
+        semantic: bool = True
+    ):
+        """Store a freshly generated response in every layer (or only the exact one)."""
+        if self.exact and key:
+            self.exact.set(key, response)
+        if self.semantic and semantic:
+            self.semantic.set(text, response, namespace=namespace)
+
+    def clear(self):
+        """Drop every cached response."""
+        if self.exact:
+            self.exact.clear()
+        if self.semantic:
+            self.semantic.clear()
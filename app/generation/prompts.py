@@ -1,5 +1,13 @@
+"""
+Prompt templates for medical text simplification.
 
-"""Prompt templates for medical text simplification."""
+Prefix caching: the reusable prefix of each template is everything before its
+first placeholder ({text}, {context}, {question}); any static text after that
+point is re-encoded on every request. Keep the prefix byte-for-byte identical
+across requests so the tokenized prefix matches and its KV states can be reused.
+"""
+
+from string import Template
 
 SYSTEM_PROMPT = """You are a helpful medical communication assistant. Your job is to help patients understand their medical information by explaining it in simple, clear language.
 
@@ -23,20 +31,20 @@ Medical text to simplify:
 
 Simplified version:"""
 
-ANSWER_PROMPT = """A patient is asking a question about their medical care. Use the following information from their medical documents to answer their question in simple, easy-to-understand language.
+ANSWER_PROMPT = """A patient is asking a question about their medical care. Use the information from their medical documents below to answer their question in simple, easy-to-understand language.
 
-Patient's question: {question}
+When you answer, remember to:
+- Use simple language (8th-grade reading level)
+- Be clear and direct
+- If the information doesn't fully answer their question, say so
+- Include any important warnings or things they should watch for
 
 Relevant information from their medical records:
 ---
 {context}
 ---
 
-Please answer the patient's question using the information above. Remember to:
-- Use simple language (8th-grade reading level)
-- Be clear and direct
-- If the information doesn't fully answer their question, say so
-- Include any important warnings or things they should watch for
+Patient's question: {question}
 
 Answer:"""
 
@@ -49,4 +57,25 @@ Text:
 
 If the text is too complex, rewrite it to be simpler. If it's already simple enough, return it unchanged.
 
-Final simplified text:"""
\ No newline at end of file
+Final simplified text:"""
+
+
+# Precompiled templates so prompts aren't re-parsed by str.format on every call
+SIMPLIFY_TPL = Template(SIMPLIFY_PROMPT.replace("{text}", "$text"))
+ANSWER_TPL = Template(ANSWER_PROMPT.replace("{question}", "$question").replace("{context}", "$context"))
+READABILITY_CHECK_TPL = Template(READABILITY_CHECK_PROMPT.replace("{text}", "$text"))
+
+
+def render_simplify(text: str) -> str:
+    """Fill SIMPLIFY_PROMPT with the text to simplify."""
+    return SIMPLIFY_TPL.substitute(text=text)
+
+
+def render_answer(question: str, context: str) -> str:
+    """Fill ANSWER_PROMPT with the patient's question and retrieved context."""
+    return ANSWER_TPL.substitute(question=question, context=context)
+
+
+def render_readability_check(text: str) -> str:
+    """Fill READABILITY_CHECK_PROMPT with the simplified text to review."""
+    return READABILITY_CHECK_TPL.substitute(text=text)
@@ -1,12 +1,17 @@
 """Medical text simplifier using open-source LLMs."""
 
+import hashlib
+import importlib.util
 import os
+import threading
+import warnings
 from typing import Optional
 from dataclasses import dataclass
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+from transformers import AutoModelForCausalLM, AutoTokenizer, CompileConfig, StaticCache
 
-from .prompts import SYSTEM_PROMPT, SIMPLIFY_PROMPT, ANSWER_PROMPT
+from .prompts import SYSTEM_PROMPT, render_simplify, render_answer, render_readability_check
+from .cache import LLMCache, cache_key
 
 
 @dataclass
@@ -37,14 +42,23 @@ class MedicalSimplifier:
         "gemma": "google/gemma-2-2b-it",
     }
     
+    # Pre-quantized checkpoint formats with fused INT4 GEMM kernels
+    QUANT_METHODS = ("awq", "gptq")
+    
+    # Stands in for the user message when the chat template is rendered once
+    _USER_PLACEHOLDER = "<<USER_PROMPT>>"
+    
     def __init__(
         self,
         model_name: str = "microsoft/Phi-3-mini-4k-instruct",
         device: Optional[str] = None,
         use_preset: Optional[str] = None,
         load_in_4bit: bool = False,
+        use_quant: Optional[str] = None,
         max_new_tokens: int = 512,
         hf_token: Optional[str] = None,
+        cache: Optional[LLMCache] = None,
+        compile_model: bool = True,
     ):
         """
         Initialize the simplifier.
@@ -53,15 +67,24 @@ class MedicalSimplifier:
             model_name: HuggingFace model name
             device: Device ('cpu', 'cuda', 'mps'). Auto-detects if None.
             use_preset: Use preset ('phi3', 'mistral', 'llama3', 'gemma')
-            load_in_4bit: Use 4-bit quantization (requires bitsandbytes)
+            load_in_4bit: Use bitsandbytes 4-bit quantization (deprecated, see use_quant)
+            use_quant: Load a pre-quantized 'awq' or 'gptq' checkpoint (CUDA only);
+                model_name must point to that checkpoint, else ValueError
             max_new_tokens: Max tokens to generate
             hf_token: HuggingFace token (needed for gated models like Llama)
+            cache: Response cache for repeated or near-duplicate inputs
+            compile_model: torch.compile the decode step (CUDA only)
         """
         if use_preset and use_preset in self.MODEL_PRESETS:
             model_name = self.MODEL_PRESETS[use_preset]
         
+        if use_quant is not None and use_quant not in self.QUANT_METHODS:
+            raise ValueError(f"Unknown use_quant '{use_quant}', expected one of {self.QUANT_METHODS}")
+        
         self.model_name = model_name
         self.max_new_tokens = max_new_tokens
+        self.temperature = 0.0  # greedy; also makes responses exact-cacheable
+        self.cache = cache
         
         # Auto-detect device
         if device is None:
@@ -73,6 +96,9 @@ class MedicalSimplifier:
                 device = "cpu"
         self.device = device
         
+        if use_quant and device != "cuda":
+            raise ValueError(f"use_quant '{use_quant}' needs a CUDA device, got '{device}'")
+        
         print(f"Loading model: {model_name}")
         print(f"Device: {device}")
         
@@ -92,10 +118,22 @@ class MedicalSimplifier:
         model_kwargs = {
             "token": token,
             "trust_remote_code": True,
-            "torch_dtype": torch.float16 if device != "cpu" else torch.float32,
+            "torch_dtype": self._load_dtype(device),
+            "attn_implementation": self._attn_implementation(device),
         }
         
-        if load_in_4bit and device == "cuda":
+        if use_quant and device == "cuda":
+            # The checkpoint carries its own quantization_config; transformers picks
+            # the fused kernels (ExLlama / Marlin) from the installed backend
+            model_kwargs["torch_dtype"] = torch.float16
+            model_kwargs["device_map"] = "cuda"
+        elif load_in_4bit and device == "cuda":
+            warnings.warn(
+                "load_in_4bit (bitsandbytes) is deprecated: its decode is usually slower "
+                "than fp16. Use use_quant='awq' or use_quant='gptq' with a pre-quantized checkpoint.",
+                DeprecationWarning,
+                stacklevel=2
+            )
             from transformers import BitsAndBytesConfig
             model_kwargs["quantization_config"] = BitsAndBytesConfig(
                 load_in_4bit=True,
@@ -107,45 +145,203 @@ class MedicalSimplifier:
         
         self.model = AutoModelForCausalLM.from_pretrained(model_name, **model_kwargs)
         
+        if use_quant:
+            # A plain checkpoint would load fine in fp16 and quietly skip the quantized kernels
+            quant_config = getattr(self.model.config, "quantization_config", None)
+            quant_method = (quant_config.get("quant_method") if isinstance(quant_config, dict)
+                            else getattr(quant_config, "quant_method", None))
+            quant_method = getattr(quant_method, "value", quant_method)
+            if quant_method != use_quant:
+                raise ValueError(
+                    f"use_quant '{use_quant}' needs a pre-quantized {use_quant} checkpoint, "
+                    f"but {model_name} has quant_method={quant_method!r}"
+                )
+        
         # Move to device if needed (for CPU or explicit device)
         if device == "cpu" or (device == "mps" and "device_map" not in model_kwargs):
             self.model = self.model.to(device)
         
-        # Create pipeline for easier generation
-        self.pipe = pipeline(
-            "text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer,
-            max_new_tokens=max_new_tokens,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9,
-            pad_token_id=self.tokenizer.pad_token_id,
+        # Token ids of the chat template around the user message, per system prompt
+        self._shell_ids: dict[str, Optional[tuple[torch.Tensor, torch.Tensor]]] = {}
+        self._prompt_shell_ids(SYSTEM_PROMPT)
+        
+        # Pre-allocated KV cache, reused (and reset) across generate calls
+        self._static_cache = StaticCache(
+            config=self.model.config,
+            max_batch_size=1,
+            max_cache_len=4096,
+            device=self.model.device,
+            dtype=self.model.dtype,
         )
+        # Requests may arrive from several worker threads; they take turns on the one cache
+        self._generate_lock = threading.Lock()
+        
+        # KV states of the constant prompt prefix, per system prompt; copied into the
+        # static cache before each request so only the user part is prefilled
+        self._prefix_kvs: dict[str, list[tuple[torch.Tensor, torch.Tensor]]] = {}
+        self._prefix_kv(SYSTEM_PROMPT)
+        
+        # Compile only the decode step: generate() runs the variable-length prefill
+        # eagerly and uses the compiled forward once the static cache is in play, where
+        # every step feeds one token so the shapes stay fixed for CUDA graphs
+        if device == "cuda":
+            self.model.generation_config.compile_config = CompileConfig(
+                mode="reduce-overhead",
+                fullgraph=False,
+                dynamic=False
+            )
+            self.model.generation_config.disable_compile = not compile_model
+        if compile_model and device == "cuda":
+            # Pay the compilation cost now rather than on the first request. The first
+            # token comes from the (eager) prefill; the decode step is compiled on the
+            # second token and its CUDA graph recorded on the third
+            self._generate("Hello", max_new_tokens=3)
         
         print(f"✓ Model loaded successfully!")
     
-    def _generate(self, prompt: str, system_prompt: str = SYSTEM_PROMPT) -> str:
-        """Generate text from a prompt."""
-        # Format for chat models
-        messages = [
+    @staticmethod
+    def _load_dtype(device: str) -> torch.dtype:
+        """bf16 where the GPU supports it (same speed as fp16, wider range), else fp16; fp32 on CPU."""
+        if device == "cuda":
+            return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        if device == "mps":
+            return torch.float16
+        return torch.float32
+    
+    @staticmethod
+    def _attn_implementation(device: str) -> str:
+        """Pick the fastest attention kernel available on this device."""
+        if device == "cuda":
+            # FlashAttention-2 needs Ampere+ and the flash-attn package
+            if torch.cuda.get_device_capability()[0] >= 8 and importlib.util.find_spec("flash_attn"):
+                return "flash_attention_2"
+            return "sdpa"
+        if device == "mps":
+            return "sdpa"
+        return "eager"
+    
+    def _build_messages(self, prompt: str, system_prompt: str = SYSTEM_PROMPT) -> list[dict]:
+        """Format a prompt as chat messages."""
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
         ]
-        
-        # Apply chat template if available
-        if hasattr(self.tokenizer, "apply_chat_template"):
-            formatted = self.tokenizer.apply_chat_template(
-                messages,
-                tokenize=False,
+    
+    def _prompt_shell_ids(self, system_prompt: str) -> Optional[tuple[torch.Tensor, torch.Tensor]]:
+        """
+        Token ids before and after the user message, rendered and tokenized once
+        per system prompt. None if the template doesn't keep the message verbatim.
+        """
+        if system_prompt not in self._shell_ids:
+            if hasattr(self.tokenizer, "apply_chat_template"):
+                formatted = self.tokenizer.apply_chat_template(
+                    self._build_messages(self._USER_PLACEHOLDER, system_prompt),
+                    tokenize=False,
+                    add_generation_prompt=True
+                )
+                add_bos = False  # the template writes its own special tokens
+            else:
+                formatted = f"{system_prompt}\n\nUser: {self._USER_PLACEHOLDER}\n\nAssistant:"
+                add_bos = True
+            
+            shell = None
+            if formatted.count(self._USER_PLACEHOLDER) == 1:
+                prefix, _, suffix = formatted.partition(self._USER_PLACEHOLDER)
+                shell = (self._encode(prefix, add_special_tokens=add_bos), self._encode(suffix))
+            self._shell_ids[system_prompt] = shell
+        return self._shell_ids[system_prompt]
+    
+    def _prefix_kv(self, system_prompt: str) -> Optional[list[tuple[torch.Tensor, torch.Tensor]]]:
+        """Per-layer (keys, values) for the template prefix, computed once per system prompt."""
+        shell = self._prompt_shell_ids(system_prompt)
+        if shell is None:
+            return None
+        if system_prompt not in self._prefix_kvs:
+            prefix_ids = shell[0]
+            n = len(prefix_ids)
+            with torch.inference_mode():
+                self._static_cache.reset()
+                self.model(prefix_ids.unsqueeze(0).to(self.model.device), past_key_values=self._static_cache, use_cache=True)
+            self._prefix_kvs[system_prompt] = [
+                (keys[:, :, :n].clone(), values[:, :, :n].clone())
+                for keys, values in self._cache_layers(self._static_cache)
+            ]
+        return self._prefix_kvs[system_prompt]
+    
+    @staticmethod
+    def _cache_layers(cache: StaticCache) -> list[tuple[torch.Tensor, torch.Tensor]]:
+        if hasattr(cache, "layers"):  # transformers >= 4.54 keeps one object per layer
+            return [(layer.keys, layer.values) for layer in cache.layers]
+        return list(zip(cache.key_cache, cache.value_cache))
+    
+    def _reset_cache(self, prefix_kv: Optional[list[tuple[torch.Tensor, torch.Tensor]]]):
+        """Clear the static cache, then write the cached prefix states back in place."""
+        self._static_cache.reset()
+        if prefix_kv is None:
+            return
+        positions = torch.arange(prefix_kv[0][0].shape[2], device=self.model.device)
+        for layer_idx, (keys, values) in enumerate(prefix_kv):
+            self._static_cache.update(keys, values, layer_idx, {"cache_position": positions})
+    
+    def _encode(self, text: str, add_special_tokens: bool = False) -> torch.Tensor:
+        return self.tokenizer(text, add_special_tokens=add_special_tokens, return_tensors="pt").input_ids[0]
+    
+    def _generate(
+        self,
+        prompt: str,
+        system_prompt: str = SYSTEM_PROMPT,
+        max_new_tokens: Optional[int] = None
+    ) -> str:
+        """Generate text from a prompt."""
+        shell = self._prompt_shell_ids(system_prompt)
+        if shell is not None:
+            # Only the user text is tokenized per request; the template shell is reused
+            prefix_ids, suffix_ids = shell
+            input_ids = torch.cat([prefix_ids, self._encode(prompt), suffix_ids]).unsqueeze(0)
+        else:
+            input_ids = self.tokenizer.apply_chat_template(
+                self._build_messages(prompt, system_prompt),
+                tokenize=True,
+                return_tensors="pt",
+                return_dict=True,
                 add_generation_prompt=True
+            )["input_ids"]
+        input_ids = input_ids.to(self.model.device)
+        
+        # Generate; with the prefix already in the cache, generate only prefills the rest.
+        # The cache is touched only under inference_mode, where its tensors were created
+        with self._generate_lock, torch.inference_mode():
+            self._reset_cache(self._prefix_kv(system_prompt))
+            outputs = self.model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=self._static_cache,
+                use_cache=True,
+                max_new_tokens=max_new_tokens or self.max_new_tokens,
+                # Greedy decoding: reproducible output and no per-token sampling
+                do_sample=False,
+                num_beams=1,
+                temperature=None,
+                top_p=None,
+                repetition_penalty=1.0,
+                pad_token_id=self.tokenizer.pad_token_id,
             )
-        else:
-            formatted = f"{system_prompt}\n\nUser: {prompt}\n\nAssistant:"
+        return self.tokenizer.decode(outputs[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
+    
+    def _generate_cached(self, prompt: str, cache_text: str, namespace: str, semantic: bool = True) -> str:
+        """Generate text, reusing a cached response for identical (or, if semantic, similar) inputs."""
+        if self.cache is None:
+            return self._generate(prompt)
+        
+        # Exact key only exists for deterministic (temperature 0) generation
+        key = cache_key(self.model_name, self._build_messages(prompt), self.temperature)
+        cached = self.cache.get(key, cache_text, namespace=namespace, semantic=semantic)
+        if cached is not None:
+            return cached
         
-        # Generate
-        outputs = self.pipe(formatted, return_full_text=False)
-        return outputs[0]["generated_text"].strip()
+        response = self._generate(prompt)
+        self.cache.set(key, cache_text, response, namespace=namespace, semantic=semantic)
+        return response
     
     def simplify_text(self, text: str) -> SimplificationResult:
         """
@@ -157,8 +353,10 @@ class MedicalSimplifier:
         Returns:
             SimplificationResult with original and simplified text
         """
-        prompt = SIMPLIFY_PROMPT.format(text=text)
-        simplified = self._generate(prompt)
+        prompt = render_simplify(text)
+        # Exact matches only: texts that differ just in a dose or a "not" embed almost
+        # identically, and replaying the other text's simplification would be wrong
+        simplified = self._generate_cached(prompt, text, namespace="simplify", semantic=False)
         
         return SimplificationResult(
             original_text=text,
@@ -177,8 +375,11 @@ class MedicalSimplifier:
         Returns:
             Simplified answer
         """
-        prompt = ANSWER_PROMPT.format(question=question, context=context)
-        return self._generate(prompt)
+        prompt = render_answer(question, context)
+        # Exact matches only, as for simplify: "Should I take it with food?" and "Should I
+        # not take it with food?" embed almost identically but need opposite answers
+        context_hash = hashlib.sha256(context.encode()).hexdigest()
+        return self._generate_cached(prompt, question, namespace=f"answer:{context_hash}", semantic=False)
     
     def simplify_with_verification(self, text: str) -> SimplificationResult:
         """
@@ -191,14 +392,7 @@ class MedicalSimplifier:
         result = self.simplify_text(text)
         
         # Stage 2: Verification (optional re-simplification)
-        verification_prompt = f"""Review this simplified medical text. Is it easy enough for someone with an 8th-grade education to understand? If it's too complex, make it simpler. If it's already simple enough, return it unchanged.
-
-Text:
----
-{result.simplified_text}
----
-
-Final version:"""
+        verification_prompt = render_readability_check(result.simplified_text)
         
         final_text = self._generate(verification_prompt)
         result.simplified_text = final_text
@@ -208,14 +402,20 @@ Final version:"""
 
 def create_simplifier(
     use_preset: str = "phi3",
-    load_in_4bit: bool = False
+    load_in_4bit: bool = False,
+    cache: Optional[LLMCache] = None,
+    model_name: Optional[str] = None,
+    use_quant: Optional[str] = None
 ) -> MedicalSimplifier:
     """
     Factory function to create a simplifier.
     
     Args:
         use_preset: Model preset ('phi3', 'mistral', 'llama3', 'gemma')
-        load_in_4bit: Use 4-bit quantization (CUDA only)
+        load_in_4bit: Use bitsandbytes 4-bit quantization (deprecated, see use_quant)
+        cache: Response cache for repeated or near-duplicate inputs
+        model_name: HuggingFace model name, overriding the preset
+        use_quant: Pre-quantized checkpoint format ('awq' or 'gptq', CUDA only)
     
     Examples:
         # Lightweight model for quick testing
@@ -223,5 +423,14 @@ def create_simplifier(
         
         # Better quality with Mistral
         simplifier = create_simplifier(use_preset="mistral")
+        
+        # Pre-quantized GPTQ checkpoint on CUDA
+        simplifier = create_simplifier(model_name="<org>/<model>-GPTQ", use_quant="gptq")
     """
-    return MedicalSimplifier(use_preset=use_preset, load_in_4bit=load_in_4bit)
\ No newline at end of file
+    if model_name is not None:
+        return MedicalSimplifier(
+            model_name=model_name, load_in_4bit=load_in_4bit, use_quant=use_quant, cache=cache
+        )
+    return MedicalSimplifier(
+        use_preset=use_preset, load_in_4bit=load_in_4bit, use_quant=use_quant, cache=cache
+    )
\ No newline at end of file
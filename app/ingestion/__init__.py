@@ -5,11 +5,14 @@ from .pdf_loader import (
     LoadedDocument,
     DocumentMetadata,
     load_documents_from_directory,
+    iter_documents_from_directory,
 )
 from .chunker import (
     MedicalTextChunker,
     TextChunk,
     chunk_documents,
+    iter_chunks,
+    get_chunker,
 )
 
 __all__ = [
@@ -17,8 +20,11 @@ __all__ = [
     "LoadedDocument", 
     "DocumentMetadata",
     "load_documents_from_directory",
+    "iter_documents_from_directory",
     "MedicalTextChunker",
     "TextChunk",
     "chunk_documents",
+    "iter_chunks",
+    "get_chunker",
 ]
 
@@ -1,10 +1,33 @@
 """Text chunking utilities optimized for medical documents."""
 
+import os
 import re
 from dataclasses import dataclass, field
-from typing import Optional
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
 import tiktoken
 
+try:
+    import blingfire  # Optional: DFA sentence splitter (C++), much faster than regex protection
+except ImportError:
+    blingfire = None
+
+
+# Below this many texts a threaded encode_batch costs more than it saves; above it,
+# use a few threads, capped like the embedding model's (EMB_NUM_THREADS) so chunking
+# in a worker thread doesn't oversubscribe the cores torch is using
+_BATCH_MIN_TEXTS = 32
+_ENCODE_THREADS = min(int(os.getenv("EMB_NUM_THREADS", "4")), os.cpu_count() or 1)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str) -> tiktoken.Encoding:
+    """Load each tiktoken encoding once per process (the BPE ranks are several MB)."""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
 
 @dataclass
 class TextChunk:
@@ -39,17 +62,38 @@ class MedicalTextChunker:
         r"INSTRUCTIONS?|CARE PLAN|TREATMENT|PRECAUTIONS?)\s*:?\s*$",
     ]
     
+    ABBREVIATIONS = ["Dr.", "Mr.", "Mrs.", "Ms.", "mg.", "mL.", "oz.", "lb.", "kg.", "a.m.", "p.m.", "e.g.", "i.e.", "vs."]
+    
+    # Compiled once per class: header patterns unioned so each line is matched in one pass
+    _HEADER_RE = re.compile(
+        "|".join(f"(?:{p.removeprefix('(?i)')})" for p in SECTION_HEADERS), re.IGNORECASE
+    )
+    _ABBR_RE = re.compile("|".join(re.escape(a) for a in ABBREVIATIONS))
+    _SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+    _LONG_SPLIT_RE = re.compile(r"[,;]|\s+(?:and|or|but)\s+")
+    _HEADER_PREFIX_RE = re.compile(r"^#+\s*")
+    _HEADER_SUFFIX_RE = re.compile(r"[:\-_]+$")
+    _CHUNK_ID_RE = re.compile(r"[^\w\-_]")
+    
     def __init__(self, chunk_size: int = 512, chunk_overlap: int = 50, model_name: str = "gpt-4o-mini"):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        try:
-            self.tokenizer = tiktoken.encoding_for_model(model_name)
-        except KeyError:
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer = _get_encoding(model_name)
+        # Per-instance memo so repeated sentences/parts are only BPE-encoded once
+        self._token_len = lru_cache(maxsize=8192)(self._encode_len)
     
-    def count_tokens(self, text: str) -> int:
+    def _encode_len(self, text: str) -> int:
         return len(self.tokenizer.encode(text))
     
+    def count_tokens(self, text: str) -> int:
+        return self._token_len(text)
+    
+    def count_tokens_batch(self, texts: list[str]) -> list[int]:
+        """Token counts for many texts (tiktoken's threaded encode_batch for large lists)."""
+        if len(texts) < _BATCH_MIN_TEXTS:
+            return [self.count_tokens(text) for text in texts]
+        return [len(tokens) for tokens in self.tokenizer.encode_batch(texts, num_threads=_ENCODE_THREADS)]
+    
     def chunk_document(self, document) -> list[TextChunk]:
         sections = self._split_into_sections(document.content)
         all_chunks = []
@@ -71,7 +115,7 @@ class MedicalTextChunker:
         current_content = []
         
         for line in lines:
-            is_header = any(re.match(p, line.strip()) for p in self.SECTION_HEADERS)
+            is_header = self._HEADER_RE.match(line.strip()) is not None
             if is_header and current_content:
                 sections.append((current_section, "\n".join(current_content).strip()))
                 current_section = self._normalize_section_name(line)
@@ -85,60 +129,67 @@ class MedicalTextChunker:
         return [(n, c) for n, c in sections if c.strip()]
     
     def _normalize_section_name(self, header: str) -> str:
-        name = re.sub(r"^#+\s*", "", header)
-        name = re.sub(r"[:\-_]+$", "", name)
+        name = self._HEADER_PREFIX_RE.sub("", header)
+        name = self._HEADER_SUFFIX_RE.sub("", name)
         return name.strip().lower()
     
     def _chunk_section(self, text: str, section_name: str, source_file: str, start_index: int = 0) -> list[TextChunk]:
         if not text.strip():
             return []
         
-        sentences = self._split_sentences(text)
-        chunks = []
+        # Count every sentence in one batched encode and carry the integers through the loop
+        sentence_texts = self._split_sentences(text)
+        sentences = list(zip(sentence_texts, self.count_tokens_batch(sentence_texts)))
+        contents = []
         current_chunk = []
         current_tokens = 0
         
-        for sentence in sentences:
-            sentence_tokens = self.count_tokens(sentence)
-            
+        # Packing decisions use the per-sentence counts only; no joined text is encoded here
+        for sentence, sentence_tokens in sentences:
             if sentence_tokens > self.chunk_size:
                 if current_chunk:
-                    chunks.append(self._create_chunk(" ".join(current_chunk), section_name, source_file, start_index + len(chunks)))
+                    contents.append(self._join(current_chunk))
                     current_chunk, current_tokens = [], 0
-                for sub in self._split_long_sentence(sentence):
-                    chunks.append(self._create_chunk(sub, section_name, source_file, start_index + len(chunks)))
+                contents.extend(self._split_long_sentence(sentence))
                 continue
             
             if current_tokens + sentence_tokens > self.chunk_size:
                 if current_chunk:
-                    chunks.append(self._create_chunk(" ".join(current_chunk), section_name, source_file, start_index + len(chunks)))
+                    contents.append(self._join(current_chunk))
                 overlap = self._get_overlap_sentences(current_chunk, self.chunk_overlap)
-                current_chunk = overlap + [sentence]
-                current_tokens = self.count_tokens(" ".join(current_chunk))
+                current_chunk = overlap + [(sentence, sentence_tokens)]
+                current_tokens = sum(tokens for _, tokens in current_chunk)
             else:
-                current_chunk.append(sentence)
+                current_chunk.append((sentence, sentence_tokens))
                 current_tokens += sentence_tokens
         
         if current_chunk:
-            chunks.append(self._create_chunk(" ".join(current_chunk), section_name, source_file, start_index + len(chunks)))
+            contents.append(self._join(current_chunk))
         
-        return chunks
+        # Exact stored token counts: one batched encode of the finished chunks
+        return [
+            self._create_chunk(content, section_name, source_file, start_index + i, token_count)
+            for i, (content, token_count) in enumerate(zip(contents, self.count_tokens_batch(contents)))
+        ]
+    
+    @staticmethod
+    def _join(sentences: list[tuple[str, int]]) -> str:
+        return " ".join(sentence for sentence, _ in sentences)
     
     def _split_sentences(self, text: str) -> list[str]:
-        protected = text
-        for abbr in ["Dr.", "Mr.", "Mrs.", "Ms.", "mg.", "mL.", "oz.", "lb.", "kg.", "a.m.", "p.m.", "e.g.", "i.e.", "vs."]:
-            protected = protected.replace(abbr, abbr.replace(".", "<<DOT>>"))
-        sentences = re.split(r"(?<=[.!?])\s+", protected)
+        if blingfire is not None:
+            # One linear DFA pass; blingfire handles abbreviations itself and emits one sentence per line
+            return [s.strip() for s in blingfire.text_to_sentences(text).split("\n") if s.strip()]
+        
+        protected = self._ABBR_RE.sub(lambda m: m.group(0).replace(".", "<<DOT>>"), text)
+        sentences = self._SENTENCE_SPLIT_RE.split(protected)
         return [s.replace("<<DOT>>", ".").strip() for s in sentences if s.strip()]
     
     def _split_long_sentence(self, sentence: str) -> list[str]:
-        parts = re.split(r"[,;]|\s+(?:and|or|but)\s+", sentence)
+        parts = [p.strip() for p in self._LONG_SPLIT_RE.split(sentence)]
+        parts = [p for p in parts if p]
         chunks, current, current_tokens = [], [], 0
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-            pt = self.count_tokens(part)
+        for part, pt in zip(parts, self.count_tokens_batch(parts)):
             if current_tokens + pt > self.chunk_size:
                 if current:
                     chunks.append(", ".join(current))
@@ -150,27 +201,50 @@ class MedicalTextChunker:
             chunks.append(", ".join(current))
         return chunks
     
-    def _get_overlap_sentences(self, sentences: list[str], target_tokens: int) -> list[str]:
+    def _get_overlap_sentences(self, sentences: list[tuple[str, int]], target_tokens: int) -> list[tuple[str, int]]:
         overlap, tokens = [], 0
-        for s in reversed(sentences):
-            st = self.count_tokens(s)
+        for s, st in reversed(sentences):
             if tokens + st > target_tokens:
                 break
-            overlap.insert(0, s)
+            overlap.insert(0, (s, st))
             tokens += st
         return overlap
     
-    def _create_chunk(self, content: str, section: str, source_file: str, index: int) -> TextChunk:
-        chunk_id = re.sub(r"[^\w\-_]", "_", f"{source_file}_{section}_{index}")
+    def _create_chunk(self, content: str, section: str, source_file: str, index: int, token_count: Optional[int] = None) -> TextChunk:
+        chunk_id = self._CHUNK_ID_RE.sub("_", f"{source_file}_{section}_{index}")
+        if token_count is None:
+            token_count = self.count_tokens(content)
         return TextChunk(content=content, chunk_id=chunk_id, source_file=source_file,
-                         chunk_index=index, token_count=self.count_tokens(content), section=section)
+                         chunk_index=index, token_count=token_count, section=section)
+
+
+@lru_cache(maxsize=None)
+def get_chunker(chunk_size: int = 512, chunk_overlap: int = 50) -> MedicalTextChunker:
+    """Shared chunker per (chunk_size, chunk_overlap), so encoders and memos are reused."""
+    return MedicalTextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
 
 
-def chunk_documents(documents: list, chunk_size: int = 512, chunk_overlap: int = 50) -> list[TextChunk]:
-    chunker = MedicalTextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    all_chunks = []
+def iter_chunks(
+    documents: Iterable,
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    chunker: Optional[MedicalTextChunker] = None
+) -> Iterator[TextChunk]:
+    """
+    Chunk documents as they arrive, e.g. streamed from iter_documents_from_directory,
+    so loading and chunking overlap.
+    """
+    chunker = chunker or get_chunker(chunk_size, chunk_overlap)
     for doc in documents:
         chunks = chunker.chunk_document(doc)
-        all_chunks.extend(chunks)
         print(f"✓ Chunked {doc.metadata.source_file}: {len(chunks)} chunks")
-    return all_chunks
\ No newline at end of file
+        yield from chunks
+
+
+def chunk_documents(
+    documents: list,
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    chunker: Optional[MedicalTextChunker] = None
+) -> list[TextChunk]:
+    return list(iter_chunks(documents, chunk_size, chunk_overlap, chunker))
\ No newline at end of file
@@ -1,10 +1,15 @@
 """PDF and document loading utilities for medical documents."""
 
+import os
 import re
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 from dataclasses import dataclass, field
 import pdfplumber
+import pypdfium2 as pdfium
 from PyPDF2 import PdfReader
 
 
@@ -43,8 +48,66 @@ class MedicalPDFLoader:
         r"(?i)(vital\s+signs?)",
     ]
     
-    def __init__(self, use_pdfplumber: bool = True):
-        self.use_pdfplumber = use_pdfplumber
+    ABBREVIATIONS = {
+        "prn": "PRN (as needed)",
+        "qd": "once daily",
+        "bid": "twice daily",
+        "tid": "three times daily",
+        "qid": "four times daily",
+        "po": "by mouth",
+        "stat": "immediately",
+    }
+    
+    # Section patterns fused into one alternation (named group per pattern) for a single scan
+    _SECTIONS_RE = re.compile(
+        "|".join(f"(?P<s{i}>{p.removeprefix('(?i)')})" for i, p in enumerate(SECTION_PATTERNS)),
+        re.IGNORECASE
+    )
+    # Every abbreviation in one pass; the match is looked up in ABBREVIATIONS
+    _ABBREVIATION_RE = re.compile(
+        r"\b(" + "|".join(map(re.escape, ABBREVIATIONS)) + r")\b", re.IGNORECASE
+    )
+    # Confidential stamp lines and "Page X of Y" footers are both dropped; the line
+    # alternative comes first so a stamp line is removed whole
+    _BOILERPLATE_RE = re.compile(r"^.*CONFIDENTIAL.*$|Page\s+\d+\s+of\s+\d+", re.IGNORECASE | re.MULTILINE)
+    # Keywords used by _classify_document, found in one scan
+    _CLASSIFY_RE = re.compile(
+        r"discharge|instructions|summary|medication|guide|information|progress note|clinical note|lab|result",
+        re.IGNORECASE
+    )
+    _HYPHENATION_RE = re.compile(r"(\w+)-\n(\w+)")
+    _BLANK_LINES_RE = re.compile(r"\n{3,}")
+    _SPACES_RE = re.compile(r"[ \t]+")
+    _TRAILING_SPACE_RE = re.compile(r" +\n")
+    
+    BACKENDS = ("pdfium", "pdfplumber", "pypdf2")
+    
+    def __init__(
+        self,
+        backend: str = "pdfium",
+        extract_tables: bool = False,
+        use_pdfplumber: Optional[bool] = None
+    ):
+        """
+        Args:
+            backend: Text extractor - 'pdfium' (fast, C++ PDFium), 'pdfplumber'
+                (slower, supports tables) or 'pypdf2'
+            extract_tables: Append table text (pdfplumber backend only)
+            use_pdfplumber: Deprecated; True selects backend='pdfplumber', False 'pypdf2'
+        """
+        if use_pdfplumber is not None:
+            warnings.warn(
+                "use_pdfplumber is deprecated; pass backend='pdfplumber' (or 'pypdf2'), "
+                "or keep the faster default backend='pdfium'.",
+                DeprecationWarning,
+                stacklevel=2
+            )
+            backend = "pdfplumber" if use_pdfplumber else "pypdf2"
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown PDF backend: {backend} (expected one of {self.BACKENDS})")
+        self.backend = backend
+        # Table extraction runs pdfplumber's full layout analysis, so it's opt-in
+        self.extract_tables = extract_tables
     
     def load(self, file_path: str | Path) -> LoadedDocument:
         """Load a PDF file and extract text with metadata."""
@@ -53,13 +116,14 @@ class MedicalPDFLoader:
         if not file_path.exists():
             raise FileNotFoundError(f"PDF not found: {file_path}")
         
-        if self.use_pdfplumber:
+        if self.backend == "pdfium":
+            raw_pages, page_count = self._load_with_pdfium(file_path)
+        elif self.backend == "pdfplumber":
             raw_pages, page_count = self._load_with_pdfplumber(file_path)
         else:
             raw_pages, page_count = self._load_with_pypdf2(file_path)
         
-        combined_text = "\n\n".join(raw_pages)
-        cleaned_text = self._preprocess_medical_text(combined_text)
+        cleaned_text = self._preprocess_medical_text(raw_pages)
         
         sections = self._identify_sections(cleaned_text)
         doc_type = self._classify_document(cleaned_text)
@@ -77,17 +141,36 @@ class MedicalPDFLoader:
             raw_pages=raw_pages
         )
     
+    def _load_with_pdfium(self, file_path: Path) -> tuple[list[str], int]:
+        pages = []
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                # PDFium emits CRLF line endings; the rest of the pipeline splits on "\n"
+                pages.append(textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n"))
+                # Release PDFium handles as we go instead of at garbage collection
+                textpage.close()
+                page.close()
+            page_count = len(pdf)
+        finally:
+            pdf.close()
+        return pages, page_count
+    
     def _load_with_pdfplumber(self, file_path: Path) -> tuple[list[str], int]:
         pages = []
         with pdfplumber.open(file_path) as pdf:
             for page in pdf.pages:
                 text = page.extract_text() or ""
-                tables = page.extract_tables()
-                if tables:
-                    for table in tables:
-                        table_text = self._table_to_text(table)
+                # Table detection (find_tables) is the expensive part and extract_tables()
+                # re-runs it, so detect once and extract from the found tables
+                if self.extract_tables:
+                    for table in page.find_tables():
+                        table_text = self._table_to_text(table.extract())
                         text += f"\n{table_text}"
                 pages.append(text)
+                # Drop cached layout objects so memory stays flat on long PDFs
+                page.flush_cache()
             page_count = len(pdf.pages)
         return pages, page_count
     
@@ -109,65 +192,118 @@ class MedicalPDFLoader:
                 rows.append(" | ".join(cells))
         return "\n".join(rows)
     
-    def _preprocess_medical_text(self, text: str) -> str:
-        text = re.sub(r"Page\s+\d+\s+of\s+\d+", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"(?m)^.*CONFIDENTIAL.*$", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"(\w+)-\n(\w+)", r"\1\2", text)
-        text = re.sub(r"\n{3,}", "\n\n", text)
-        text = re.sub(r"[ \t]+", " ", text)
-        text = re.sub(r" +\n", "\n", text)
-        
-        abbreviations = {
-            r"\bprn\b": "PRN (as needed)",
-            r"\bqd\b": "once daily",
-            r"\bbid\b": "twice daily",
-            r"\btid\b": "three times daily",
-            r"\bqid\b": "four times daily",
-            r"\bpo\b": "by mouth",
-            r"\bstat\b": "immediately",
-        }
-        for pattern, replacement in abbreviations.items():
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    def _preprocess_page(self, text: str) -> str:
+        """Page-local cleanup: footers, stamps, hyphenation, spacing and abbreviations."""
+        text = self._BOILERPLATE_RE.sub("", text)
+        text = self._HYPHENATION_RE.sub(r"\1\2", text)
+        text = self._SPACES_RE.sub(" ", text)
+        text = self._ABBREVIATION_RE.sub(lambda m: self.ABBREVIATIONS[m.group(1).lower()], text)
+        return text
+    
+    def _preprocess_medical_text(self, pages: list[str]) -> str:
+        # Each page is cleaned on its own; only the line/blank-line passes that
+        # can span a page break run over the joined document
+        text = "\n\n".join(self._preprocess_page(page) for page in pages)
+        text = self._BLANK_LINES_RE.sub("\n\n", text)
+        text = self._TRAILING_SPACE_RE.sub("\n", text)
         
         return text.strip()
     
     def _identify_sections(self, text: str) -> list[str]:
-        found = []
-        for pattern in self.SECTION_PATTERNS:
-            match = re.search(pattern, text)
-            if match:
-                found.append(match.group(1).strip().lower())
-        return list(set(found))
+        # First hit per pattern, as a separate search per pattern would give
+        first_hits = {}
+        for match in self._SECTIONS_RE.finditer(text):
+            first_hits.setdefault(match.lastgroup, match.group().strip().lower())
+            if len(first_hits) == len(self.SECTION_PATTERNS):
+                break
+        return list(dict.fromkeys(first_hits.values()))
     
     def _classify_document(self, text: str) -> str:
-        text_lower = text.lower()
-        if "discharge" in text_lower and ("instructions" in text_lower or "summary" in text_lower):
-            return "discharge_summary"
-        elif "medication" in text_lower and ("guide" in text_lower or "information" in text_lower):
+        # Same substring tests as before, but the document is scanned once
+        found = set()
+        for match in self._CLASSIFY_RE.finditer(text):
+            found.add(match.group().lower())
+            if "discharge" in found and ("instructions" in found or "summary" in found):
+                return "discharge_summary"
+        
+        if "medication" in found and ("guide" in found or "information" in found):
             return "medication_guide"
-        elif "progress note" in text_lower or "clinical note" in text_lower:
+        elif "progress note" in found or "clinical note" in found:
             return "doctor_note"
-        elif "lab" in text_lower and "result" in text_lower:
+        elif "lab" in found and "result" in found:
             return "lab_results"
         else:
             return "medical_document"
 
 
+def _load_one(file_path: Path) -> LoadedDocument:
+    """Load a single PDF (module-level so it can be pickled into worker processes)."""
+    return MedicalPDFLoader().load(file_path)
+
+
+def _find_documents(directory: str | Path, extensions: list[str]) -> list[Path]:
+    directory = Path(directory)
+    return [path for ext in extensions for path in directory.glob(f"*{ext}")]
+
+
 def load_documents_from_directory(
     directory: str | Path,
-    extensions: list[str] = [".pdf"]
+    extensions: list[str] = [".pdf"],
+    max_workers: Optional[int] = None
 ) -> list[LoadedDocument]:
-    directory = Path(directory)
-    loader = MedicalPDFLoader()
+    file_paths = _find_documents(directory, extensions)
     documents = []
     
-    for ext in extensions:
-        for file_path in directory.glob(f"*{ext}"):
+    if not file_paths:
+        return documents
+    
+    # PDF text extraction is CPU-bound, so load files in parallel across processes
+    max_workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_load_one, file_path) for file_path in file_paths]
+        for file_path, future in zip(file_paths, futures):
             try:
-                doc = loader.load(file_path)
+                doc = future.result()
                 documents.append(doc)
                 print(f"✓ Loaded: {file_path.name} ({doc.metadata.page_count} pages)")
             except Exception as e:
                 print(f"✗ Failed to load {file_path.name}: {e}")
     
-    return documents
\ No newline at end of file
+    return documents
+
+
+def iter_documents_from_directory(
+    directory: str | Path,
+    extensions: list[str] = [".pdf"],
+    max_workers: Optional[int] = None
+) -> Iterator[LoadedDocument]:
+    """
+    Yield documents as the worker processes finish them (completion order).
+    
+    Only 2 * max_workers files are in flight at a time, so a consumer can
+    chunk each document while the rest load, without holding the whole corpus.
+    """
+    file_paths = _find_documents(directory, extensions)
+    if not file_paths:
+        return
+    
+    max_workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+    remaining = iter(file_paths)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {executor.submit(_load_one, path): path for path in islice(remaining, 2 * max_workers)}
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = in_flight.pop(future)
+                # Keep the workers busy before handing the result downstream
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    in_flight[executor.submit(_load_one, next_path)] = next_path
+                
+                try:
+                    doc = future.result()
+                except Exception as e:
+                    print(f"✗ Failed to load {file_path.name}: {e}")
+                    continue
+                print(f"✓ Loaded: {file_path.name} ({doc.metadata.page_count} pages)")
+                yield doc
\ No newline at end of file
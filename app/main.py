@@ -3,8 +3,10 @@ FastAPI backend for Patient Communication Assistant.
 Run: uvicorn app.main:app --reload
 """
 
+import asyncio
 import os
 import sys
+import threading
 from pathlib import Path
 from typing import Optional
 from contextlib import asynccontextmanager
@@ -18,10 +20,13 @@ import tempfile
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.ingestion.pdf_loader import MedicalPDFLoader
-from app.ingestion.chunker import MedicalTextChunker
+from app.ingestion.chunker import get_chunker
 from app.retrieval.embeddings import get_embedding_model
 from app.retrieval.vector_store import VectorStore
-from app.evaluation.readability import ReadabilityScorer, check_readability
+from app.evaluation.readability import ReadabilityScorer
+from app.evaluation import _syllables
+from app.generation.cache import LLMCache, ExactCache, SemanticLLMCache
+from app.config import get_settings
 
 
 # ============================================================
@@ -31,13 +36,20 @@ from app.evaluation.readability import ReadabilityScorer, check_readability
 class AppState:
     vector_store: Optional[VectorStore] = None
     embedding_model = None
-    simplifier = None  # Loaded lazily to save memory
+    simplifier = None  # Preloaded in the background at startup (or lazily if disabled)
+    simplifier_ready: Optional[asyncio.Event] = None
+    simplifier_task: Optional[asyncio.Task] = None
+    simplifier_lock = threading.Lock()  # One model load at a time, across worker threads
+    llm_cache: Optional[LLMCache] = None
     readability_scorer = ReadabilityScorer(target_grade_level=8.0)
-    chunker = MedicalTextChunker(chunk_size=300, chunk_overlap=50)
+    chunker = get_chunker(chunk_size=300, chunk_overlap=50)
     pdf_loader = MedicalPDFLoader()
 
 state = AppState()
 
+# Uploads are copied to disk in blocks of this many bytes
+UPLOAD_BLOCK_SIZE = 1 << 20
+
 
 # ============================================================
 # Lifespan (startup/shutdown)
@@ -47,26 +59,52 @@ state = AppState()
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting Patient Communication Assistant...")
+    settings = get_settings()
+    
+    # Warm the syllable cache with common medical vocabulary
+    _syllables.preload()
     
     # Load embedding model
     print("Loading embedding model...")
-    state.embedding_model = get_embedding_model(use_preset="fast")
+    state.embedding_model = get_embedding_model(use_preset="fast", backend=settings.embedding_backend)
+    # Bypasses the embedding caches, so it doesn't show up in /stats
+    state.embedding_model.warmup()
     
     # Create vector store
     persist_dir = os.getenv("VECTOR_STORE_PATH", "data/vector_store")
     state.vector_store = VectorStore(
         collection_name="patient_docs",
         persist_directory=persist_dir,
-        embedding_model=state.embedding_model
+        embedding_model=state.embedding_model,
+        quantization=settings.vector_quantization
     )
     print(f"✓ Vector store ready ({state.vector_store.get_chunk_count()} chunks)")
     
+    # LLM response cache: exact match, then semantic for callers that opt in (the simplifier's
+    # patient-facing calls are exact-only); the semantic layer shares the retrieval embedding model
+    if settings.llm_cache_enabled:
+        state.llm_cache = LLMCache(
+            exact=ExactCache(maxsize=settings.llm_exact_cache_size),
+            semantic=SemanticLLMCache(
+                embed_fn=state.embedding_model.embed_query,
+                threshold=settings.llm_cache_threshold,
+                ttl=settings.llm_cache_ttl
+            )
+        )
+    
+    # Load the LLM in the background so the first request doesn't pay for it
+    if settings.preload_simplifier:
+        state.simplifier_ready = asyncio.Event()
+        state.simplifier_task = asyncio.create_task(preload_simplifier())
+    
     print("✅ Backend ready!")
     
     yield
     
     # Shutdown
     print("Shutting down...")
+    if state.simplifier_task and not state.simplifier_task.done():
+        state.simplifier_task.cancel()
 
 
 # ============================================================
@@ -130,12 +168,35 @@ class UploadResponse(BaseModel):
 # ============================================================
 
 def get_simplifier():
-    """Lazy load the LLM simplifier to save memory."""
-    if state.simplifier is None:
-        print("Loading LLM simplifier (first request, may take a moment)...")
-        from app.generation.simplifier import create_simplifier
-        state.simplifier = create_simplifier(use_preset="phi3")
-    return state.simplifier
+    """Load the LLM simplifier if it isn't loaded yet."""
+    with state.simplifier_lock:
+        if state.simplifier is None:
+            print("Loading LLM simplifier (may take a moment)...")
+            from app.generation.simplifier import create_simplifier
+            state.simplifier = create_simplifier(use_preset="phi3", cache=state.llm_cache)
+        return state.simplifier
+
+
+async def preload_simplifier():
+    """Load the simplifier in a worker thread, then signal waiting requests."""
+    try:
+        await asyncio.to_thread(get_simplifier)
+        print("✓ LLM simplifier ready")
+    except Exception as e:
+        # Requests will retry the load (and surface the error) via get_simplifier()
+        print(f"✗ Failed to preload LLM simplifier: {e}")
+    finally:
+        state.simplifier_ready.set()
+
+
+async def wait_for_simplifier():
+    """Return the simplifier, waiting for the startup preload if one is running."""
+    if state.simplifier_ready is not None:
+        await state.simplifier_ready.wait()
+    if state.simplifier is not None:
+        return state.simplifier
+    # Preload failed or was disabled: load in a worker thread so other requests keep being served
+    return await asyncio.to_thread(get_simplifier)
 
 
 def format_context_for_answer(results) -> str:
@@ -182,6 +243,10 @@ async def get_stats():
         "total_chunks": state.vector_store.get_chunk_count(),
         "sections": state.vector_store.get_all_sections(),
         "embedding_model": state.embedding_model.model_name if state.embedding_model else None,
+        "embedding_cache": state.embedding_model.cache_stats() if state.embedding_model else None,
+        "query_cache": state.embedding_model.query_cache_stats() if state.embedding_model else None,
+        "readability_cache": dict(state.readability_scorer.stats),
+        "llm_cache": state.llm_cache.stats if state.llm_cache else None,
     }
 
 
@@ -191,26 +256,24 @@ async def upload_document(file: UploadFile = File(...)):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
+    tmp_path = None
     try:
-        # Save uploaded file temporarily
+        # Stream the upload to a temp file in 1 MiB blocks instead of reading it whole
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            content = await file.read()
-            tmp.write(content)
             tmp_path = tmp.name
+            while block := await file.read(UPLOAD_BLOCK_SIZE):
+                tmp.write(block)
         
-        # Load and process PDF
-        doc = state.pdf_loader.load(tmp_path)
-        chunks = state.chunker.chunk_document(doc)
+        # Load and process PDF (parsing and chunking run in worker threads, off the event loop)
+        doc = await asyncio.to_thread(state.pdf_loader.load, tmp_path)
+        chunks = await asyncio.to_thread(state.chunker.chunk_document, doc)
         
         # Update source file name to original
         for chunk in chunks:
             chunk.source_file = file.filename
         
-        # Add to vector store
-        state.vector_store.add_chunks(chunks, show_progress=False)
-        
-        # Cleanup
-        os.unlink(tmp_path)
+        # Add to vector store (embedding also runs in a worker thread)
+        await asyncio.to_thread(state.vector_store.add_chunks, chunks, show_progress=False)
         
         return UploadResponse(
             filename=file.filename,
@@ -221,6 +284,10 @@ async def upload_document(file: UploadFile = File(...)):
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
+    finally:
+        # Cleanup
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
 
 
 @app.post("/ask", response_model=QuestionResponse)
@@ -235,32 +302,37 @@ async def ask_question(request: QuestionRequest):
             detail="No documents indexed. Please upload a document first."
         )
     
-    # Retrieve relevant chunks
-    results = state.vector_store.search(request.question, n_results=request.n_results)
+    # Retrieve relevant chunks (query embedding + index search run in a worker thread)
+    results = await asyncio.to_thread(
+        state.vector_store.search, request.question, n_results=request.n_results
+    )
     
-    # Format sources
-    sources = [
-        {
-            "content": r.content,
-            "section": r.metadata.get("section", "unknown"),
-            "source_file": r.metadata.get("source_file", "unknown"),
-            "score": round(r.score, 3)
-        }
-        for r in results
-    ]
+    # Collected once: joined into the LLM context and returned as the sources
+    contents = [r.content for r in results]
     
     # Generate answer
     if request.use_simplifier and results:
         # Use LLM to generate simplified answer
-        simplifier = get_simplifier()
-        context = "\n\n".join([r.content for r in results])
-        answer = simplifier.answer_question(request.question, context)
+        simplifier = await wait_for_simplifier()
+        context = "\n\n".join(contents)
+        answer = await asyncio.to_thread(simplifier.answer_question, request.question, context)
     else:
         # Return formatted context directly
         answer = format_context_for_answer(results)
     
-    # Check readability
-    readability = check_readability(answer)
+    # Score readability
+    readability = state.readability_scorer.score(answer)
+    
+    # Format sources
+    sources = [
+        {
+            "content": content,
+            "section": r.metadata.get("section", "unknown"),
+            "source_file": r.metadata.get("source_file", "unknown"),
+            "score": round(r.score, 3)
+        }
+        for r, content in zip(results, contents)
+    ]
     
     return QuestionResponse(
         question=request.question,
@@ -273,16 +345,16 @@ async def ask_question(request: QuestionRequest):
 @app.post("/simplify", response_model=SimplifyResponse)
 async def simplify_text(request: SimplifyRequest):
     """Simplify medical text to patient-friendly language."""
-    simplifier = get_simplifier()
+    simplifier = await wait_for_simplifier()
     
     # Get readability before
-    readability_before = check_readability(request.text)
+    readability_before = state.readability_scorer.score(request.text)
     
-    # Simplify
-    result = simplifier.simplify_text(request.text)
+    # Simplify (generation runs in a worker thread so other requests keep being served)
+    result = await asyncio.to_thread(simplifier.simplify_text, request.text)
     
     # Get readability after
-    readability_after = check_readability(result.simplified_text)
+    readability_after = state.readability_scorer.score(result.simplified_text)
     
     # Calculate improvement
     improvement = {
@@ -307,7 +379,7 @@ async def simplify_text(request: SimplifyRequest):
 @app.post("/readability")
 async def analyze_readability(request: ReadabilityRequest):
     """Analyze readability of text without simplification."""
-    score = check_readability(request.text)
+    score = state.readability_scorer.score(request.text)
     return {
         "text_preview": request.text[:200] + "..." if len(request.text) > 200 else request.text,
         "readability": score.to_dict(),
@@ -323,5 +395,5 @@ async def analyze_readability(request: ReadabilityRequest):
 @app.delete("/clear")
 async def clear_index():
     """Clear all indexed documents."""
-    state.vector_store.clear()
+    await asyncio.to_thread(state.vector_store.clear)
     return {"status": "cleared", "chunks_remaining": 0}
\ No newline at end of file
@@ -1,11 +1,13 @@
 """Retrieval module for embeddings and vector store operations."""
 
 from .embeddings import EmbeddingModel, get_embedding_model
+from .embedding_cache import EmbeddingCache
 from .vector_store import VectorStore, create_vector_store
 
 __all__ = [
     "EmbeddingModel",
     "get_embedding_model",
+    "EmbeddingCache",
     "VectorStore",
     "create_vector_store",
 ]
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""Persistent cache of text embeddings, so repeated content isn't re-encoded."""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+
+
+def text_hash(text: str) -> bytes:
+    """SHA-256 digest used as the cache key for a text."""
+    return hashlib.sha256(text.encode()).digest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed map of (model, sha256(text)) -> float32 vector, where model
+    identifies the model and backend that produced the vector.
+
+    Vectors are stored as raw float32 bytes (dimensions * 4), not pickles.
+    """
+
+    # SQLite's default limit on bound parameters is 999
+    _MAX_PARAMS = 900
+
+    def __init__(self, path: str | Path):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get_many(self, model_name: str, hashes: list[bytes]) -> dict[bytes, np.ndarray]:
+        """Look up many hashes at once; missing ones are absent from the result."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), self._MAX_PARAMS):
+                batch = unique[start:start + self._MAX_PARAMS]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model_name, *batch]
+                )
+                for digest, vector in rows:
+                    found[digest] = np.frombuffer(vector, dtype=np.float32)
+            hits = sum(1 for digest in hashes if digest in found)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(hashes) - hits
+        return found
+
+    def set_many(self, model_name: str, hashes: list[bytes], vectors: np.ndarray):
+        """Store one vector per hash."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model_name, digest, vector.tobytes()) for digest, vector in zip(hashes, vectors)]
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every cached embedding."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
@@ -1,18 +1,44 @@
 """Open-source embedding models via Sentence Transformers."""
 
+import os
+import threading
+import warnings
+from collections import OrderedDict
 from typing import Optional
 from dataclasses import dataclass
 from sentence_transformers import SentenceTransformer
 import numpy as np
+import torch
+
+from .embedding_cache import EmbeddingCache, text_hash
+
+# Cap PyTorch's intra-op threads (default: one per core) so Uvicorn workers don't
+# contend for the same CPUs; encoding scales to about 4-8 cores. EMB_NUM_THREADS overrides.
+torch.set_num_threads(min(int(os.getenv("EMB_NUM_THREADS", "4")), os.cpu_count() or 1))
+try:
+    torch.set_num_interop_threads(1)
+except RuntimeError:
+    pass  # can only be set once, before any inter-op parallel work
 
 
 @dataclass
 class EmbeddingResult:
     """Container for embedding results."""
     text: str
-    embedding: list[float]
+    embedding: np.ndarray           # float32, unit length (a row view for batch results)
     model: str
     dimensions: int
+    
+    def to_list(self) -> list[float]:
+        """Embedding as Python floats, for JSON or other non-NumPy consumers."""
+        return self.embedding.tolist()
+
+
+def _normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize each row in place (one vectorized pass) and return the array."""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
+    return embeddings
 
 
 class EmbeddingModel:
@@ -34,11 +60,20 @@ class EmbeddingModel:
         "medical-alt": "NeuML/pubmedbert-base-embeddings",
     }
     
+    # Inference backends; onnx/openvino need sentence-transformers>=3.2 with the matching extra
+    BACKENDS = ("torch", "onnx", "openvino")
+    
+    # int8 ONNX export shipped in sentence-transformers model repos (AVX-512 VNNI GEMMs)
+    ONNX_CPU_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+    
     def __init__(
         self,
         model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
         device: Optional[str] = None,
-        use_preset: Optional[str] = None
+        use_preset: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        backend: str = "torch",
+        query_cache_size: int = 1024
     ):
         """
         Initialize the embedding model.
@@ -47,25 +82,83 @@ class EmbeddingModel:
             model_name: HuggingFace model name or path
             device: Device to use ('cpu', 'cuda', 'mps'). Auto-detects if None.
             use_preset: Use a preset model ('fast', 'balanced', 'medical')
+            cache: Persistent cache that batch encodes look up before running the model
+            backend: 'torch', 'onnx' (int8 ONNX Runtime, recommended for CPU serving)
+                or 'openvino'
+            query_cache_size: Max search queries kept in the in-memory LRU (0 disables it)
         """
         if use_preset and use_preset in self.MODEL_PRESETS:
             model_name = self.MODEL_PRESETS[use_preset]
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {backend} (expected one of {self.BACKENDS})")
         
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name, device=device)
+        self.backend = backend
+        self.cache = cache
+        # Cache rows are per model *and* backend: int8 ONNX vectors differ from fp32 torch ones
+        self._cache_model = f"{model_name}|{backend}" + (f"|{self.ONNX_CPU_FILE}" if backend == "onnx" else "")
+        # Repeated questions skip the model entirely; shared across request threads
+        self.query_cache_size = query_cache_size
+        self._query_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._query_lock = threading.Lock()
+        self._query_stats = {"hits": 0, "misses": 0}
+        if backend == "torch":
+            self.model = SentenceTransformer(model_name, device=device)
+        elif backend == "onnx":
+            self.model = SentenceTransformer(
+                model_name,
+                device=device,
+                backend="onnx",
+                model_kwargs={"file_name": self.ONNX_CPU_FILE, "provider": "CPUExecutionProvider"}
+            )
+        else:
+            self.model = SentenceTransformer(model_name, device=device, backend="openvino")
         self.dimensions = self.model.get_sentence_embedding_dimension()
         
         print(f"✓ Loaded embedding model: {model_name}")
         print(f"  Dimensions: {self.dimensions}")
-        print(f"  Device: {self.model.device}")
+        print(f"  Device: {self.model.device} ({backend})")
+    
+    def warmup(self):
+        """Run one throwaway encode so the first real request skips lazy init and kernel setup."""
+        self._encode(["warmup"])
+    
+    def _encode(self, texts: list[str], **kwargs) -> np.ndarray:
+        # No autograd bookkeeping (older sentence-transformers only disable grad)
+        with torch.inference_mode():
+            return self.model.encode(texts, convert_to_numpy=True, **kwargs)
+    
+    def _encode_cached(self, texts: list[str], **kwargs) -> np.ndarray:
+        """Batch encode, running the model only on texts missing from the cache."""
+        if self.cache is None or not texts:
+            return self._encode(texts, **kwargs)
+        
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self._cache_model, hashes)
+        misses = [i for i, digest in enumerate(hashes) if digest not in vectors]
+        if misses:
+            miss_hashes = [hashes[i] for i in misses]
+            encoded = self._encode([texts[i] for i in misses], **kwargs)
+            self.cache.set_many(self._cache_model, miss_hashes, encoded)
+            vectors.update(zip(miss_hashes, encoded))
+        return np.stack([vectors[digest] for digest in hashes])
+    
+    def cache_stats(self) -> dict:
+        """Embedding cache hits/misses (zeros when no cache is attached)."""
+        return dict(self.cache.stats) if self.cache else {"hits": 0, "misses": 0}
+    
+    def query_cache_stats(self) -> dict:
+        """Query embedding LRU hits/misses and current size."""
+        with self._query_lock:
+            return {**self._query_stats, "size": len(self._query_cache)}
     
     def embed_text(self, text: str) -> EmbeddingResult:
-        """Generate embedding for a single text."""
-        embedding = self.model.encode(text, convert_to_numpy=True)
+        """Generate a (unit-length) embedding for a single text."""
+        embedding = _normalize_rows(self._encode([text]))[0]
         
         return EmbeddingResult(
             text=text,
-            embedding=embedding.tolist(),
+            embedding=embedding,
             model=self.model_name,
             dimensions=self.dimensions
         )
@@ -79,44 +172,89 @@ class EmbeddingModel:
         """
         Generate embeddings for multiple texts with batching.
         
+        Deprecated: use embed_texts, which returns one (N, dimensions) array
+        instead of a wrapper object per text.
+        
         Args:
             texts: List of texts to embed
             batch_size: Batch size for encoding
             show_progress: Whether to show progress bar
         """
-        embeddings = self.model.encode(
-            texts,
-            batch_size=batch_size,
-            show_progress_bar=show_progress,
-            convert_to_numpy=True
+        warnings.warn(
+            "EmbeddingModel.embed_batch is deprecated; use embed_texts for an ndarray of embeddings",
+            DeprecationWarning,
+            stacklevel=2
         )
+        embeddings = self.embed_texts(texts, batch_size=batch_size, show_progress=show_progress)
         
-        results = []
-        for i, text in enumerate(texts):
-            results.append(EmbeddingResult(
+        return [
+            EmbeddingResult(
                 text=text,
-                embedding=embeddings[i].tolist(),
+                embedding=embedding,
                 model=self.model_name,
                 dimensions=self.dimensions
-            ))
+            )
+            for text, embedding in zip(texts, embeddings)
+        ]
+    
+    def embed_texts(self, texts: list[str], batch_size: int = 64, show_progress: bool = False) -> np.ndarray:
+        """
+        Encode texts in a single batched call.
+        
+        Returns a (len(texts), dimensions) array of L2-normalized embeddings,
+        skipping the per-text EmbeddingResult wrappers built by embed_batch.
+        Callers should keep the array as is (e.g. pass it straight to the index).
+        Repeated texts (boilerplate shared across documents) are encoded once.
+        """
+        # Row of each text among the distinct texts, in first-seen order
+        rows: dict[str, int] = {}
+        order = [rows.setdefault(text, len(rows)) for text in texts]
+        unique = list(rows)
         
-        return results
+        embeddings = _normalize_rows(self._encode_cached(
+            unique,
+            batch_size=batch_size,
+            show_progress_bar=show_progress
+        ))
+        return embeddings if len(unique) == len(texts) else embeddings[order]
     
-    def embed_query(self, query: str) -> list[float]:
-        """Generate embedding for a search query (convenience method)."""
-        result = self.embed_text(query)
-        return result.embedding
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Generate embedding for a search query (memoized for repeated queries).
+        
+        Returns a read-only float32 vector shared with the cache; copy it
+        before modifying it in place.
+        """
+        with self._query_lock:
+            cached = self._query_cache.get(query)
+            if cached is not None:
+                self._query_cache.move_to_end(query)
+                self._query_stats["hits"] += 1
+                return cached
+            self._query_stats["misses"] += 1
+        
+        # Encode outside the lock so concurrent misses don't queue behind each other
+        embedding = self.embed_text(query).embedding
+        embedding.flags.writeable = False
+        if self.query_cache_size > 0:
+            with self._query_lock:
+                self._query_cache[query] = embedding
+                self._query_cache.move_to_end(query)
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return embedding
     
     def similarity(self, text1: str, text2: str) -> float:
         """Compute cosine similarity between two texts."""
-        emb1 = np.array(self.embed_query(text1))
-        emb2 = np.array(self.embed_query(text2))
-        return float(np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2)))
+        # Both texts in one encode; unit-length rows make cosine similarity a dot product
+        emb1, emb2 = _normalize_rows(self._encode([text1, text2]))
+        return float(emb1 @ emb2)
 
 
 def get_embedding_model(
     model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
-    use_preset: Optional[str] = None
+    use_preset: Optional[str] = None,
+    backend: str = "torch"
 ) -> EmbeddingModel:
     """
     Factory function to get an embedding model.
@@ -124,6 +262,7 @@ def get_embedding_model(
     Args:
         model_name: HuggingFace model name
         use_preset: Use preset ('fast', 'balanced', 'medical')
+        backend: 'torch', 'onnx' or 'openvino' (use 'onnx' for CPU serving)
     
     Examples:
         # Fast general-purpose model
@@ -134,5 +273,8 @@ def get_embedding_model(
         
         # Custom model
         model = get_embedding_model("your-org/your-model")
+        
+        # int8 ONNX Runtime on CPU
+        model = get_embedding_model(use_preset="fast", backend="onnx")
     """
-    return EmbeddingModel(model_name=model_name, use_preset=use_preset)
\ No newline at end of file
+    return EmbeddingModel(model_name=model_name, use_preset=use_preset, backend=backend)
\ No newline at end of file
@@ -1,11 +1,17 @@
-"""ChromaDB vector store for medical document retrieval."""
+"""FAISS vector store for medical document retrieval."""
 
+import os
+import pickle
+import threading
+from collections import Counter
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 from dataclasses import dataclass
-import chromadb
+import faiss
+import numpy as np
 
 from .embeddings import EmbeddingModel, get_embedding_model
+from .embedding_cache import EmbeddingCache
 
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
@@ -22,81 +28,246 @@ class SearchResult:
 
 
 class VectorStore:
-    """ChromaDB-based vector store for medical documents."""
+    """
+    In-process FAISS HNSW vector store for medical documents.
+    
+    Embeddings are unit-length, so inner product is cosine similarity.
+    Documents and metadata are kept in Python lists aligned with the
+    index's internal row ids.
+    
+    Stored vectors can be compressed with quantization:
+    - "none":   float32 HNSW (4 bytes per dimension)
+    - "pq":     HNSW over product-quantized codes (1 byte per 4 dimensions, 16x smaller)
+    - "binary": HNSW over sign bits, Hamming distance (1 bit per dimension, 32x smaller)
+    """
+    
+    QUANTIZATIONS = ("none", "pq", "binary")
+    
+    # PQ codebooks are trained once this many vectors have arrived; until then
+    # the buffered float vectors are searched exactly
+    PQ_TRAIN_SIZE = 10_000
+    
+    # HNSW graph parameters
+    HNSW_M = 16
+    EF_CONSTRUCTION = 64
+    EF_SEARCH = 64
+    
+    # Over-fetch factor when post-filtering by section/source
+    FILTER_OVERFETCH = 3
+    
+    # Persisted indexes are memory-mapped read-only; adds copy only what they touch
+    MMAP_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
     
     def __init__(
         self,
         collection_name: str = "discharge_docs",
         persist_directory: Optional[str] = None,
         embedding_model: Optional[EmbeddingModel] = None,
-        use_medical_embeddings: bool = False
+        use_medical_embeddings: bool = False,
+        embedding_backend: str = "torch",
+        quantization: Literal["none", "pq", "binary"] = "none"
     ):
         """
         Initialize vector store.
         
         Args:
-            collection_name: Name for the ChromaDB collection
+            collection_name: Name for the collection (index file stem when persisted)
             persist_directory: Path to persist data (None = in-memory)
             embedding_model: Custom embedding model (auto-creates if None)
             use_medical_embeddings: Use medical domain embeddings
+            embedding_backend: Backend for an auto-created embedding model ('torch', 'onnx', 'openvino')
+            quantization: Stored vector format ('none', 'pq', 'binary')
         """
+        if quantization not in self.QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (expected one of {self.QUANTIZATIONS})")
         self.collection_name = collection_name
+        self.quantization = quantization
         
         # Initialize embedding model
         if embedding_model:
             self.embedding_model = embedding_model
         elif use_medical_embeddings:
-            self.embedding_model = get_embedding_model(use_preset="medical")
+            self.embedding_model = get_embedding_model(use_preset="medical", backend=embedding_backend)
         else:
-            self.embedding_model = get_embedding_model(use_preset="fast")
+            self.embedding_model = get_embedding_model(use_preset="fast", backend=embedding_backend)
         
-        # Initialize ChromaDB
+        self.persist_path = None
         if persist_directory:
-            persist_path = Path(persist_directory)
-            persist_path.mkdir(parents=True, exist_ok=True)
-            self.client = chromadb.PersistentClient(path=str(persist_path))
-        else:
-            self.client = chromadb.Client()
+            self.persist_path = Path(persist_directory)
+            self.persist_path.mkdir(parents=True, exist_ok=True)
+            # Re-uploaded or templated content is looked up instead of re-encoded
+            if self.embedding_model.cache is None:
+                self.embedding_model.cache = EmbeddingCache(self.persist_path / "emb_cache.db")
         
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
+        self._ids: list[str] = []
+        self._documents: list[str] = []
+        self._metadatas: list[dict] = []
+        self._rows: dict[str, int] = {}
+        # Chunks per section, kept in step with _metadatas so /stats needn't scan it
+        self._section_counts: Counter[str] = Counter()
+        # Float vectors waiting for PQ training (rows follow the indexed ones)
+        self._pending = np.empty((0, self.embedding_model.dimensions), dtype=np.float32)
+        # Uploads, searches and clears arrive from worker threads; index rows, the
+        # aligned lists and the files on disk are only touched while holding this
+        self._lock = threading.Lock()
+        
+        if self.persist_path and self._index_file.exists():
+            self._load()
+        else:
+            self.index = self._new_index()
+    
+    @property
+    def _index_file(self) -> Path:
+        return self.persist_path / f"{self.collection_name}.faiss"
+    
+    @property
+    def _meta_file(self) -> Path:
+        return self.persist_path / f"{self.collection_name}.pkl"
+    
+    def _new_index(self) -> faiss.Index | faiss.IndexBinary:
+        dim = self.embedding_model.dimensions
+        if self.quantization == "pq":
+            index = faiss.IndexHNSWPQ(dim, dim // 4, self.HNSW_M, 8, faiss.METRIC_INNER_PRODUCT)
+        elif self.quantization == "binary":
+            index = faiss.IndexBinaryHNSW(dim, self.HNSW_M)
+        else:
+            index = faiss.IndexHNSWFlat(dim, self.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = self.EF_CONSTRUCTION
+        index.hnsw.efSearch = self.EF_SEARCH
+        return index
+    
+    def _load(self):
+        with open(self._meta_file, "rb") as f:
+            meta = pickle.load(f)
+        if meta["quantization"] != self.quantization:
+            raise ValueError(
+                f"Index '{self.collection_name}' was built with quantization={meta['quantization']!r}, "
+                f"not {self.quantization!r}"
+            )
+        self._ids, self._documents, self._metadatas = meta["ids"], meta["documents"], meta["metadatas"]
+        self._pending = meta["pending"]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        # Files saved before the counter was persisted rebuild it from the metadata
+        self._section_counts = meta.get("section_counts") or Counter(
+            m["section"] for m in self._metadatas if m and "section" in m
         )
+        
+        # Memory-map the index file: loading is near-instant and workers share the page cache
+        if self.quantization == "binary":
+            self.index = faiss.read_index_binary(str(self._index_file), self.MMAP_FLAGS)
+        else:
+            self.index = faiss.read_index(str(self._index_file), self.MMAP_FLAGS)
+        self.index.hnsw.efSearch = self.EF_SEARCH
+    
+    def _save(self):
+        # Callers hold self._lock, so only one save uses the .tmp paths at a time
+        if self.persist_path is None:
+            return
+        # Write to temp files and rename over the old ones, so a crash mid-save (or
+        # another worker mapping the index) never sees a half-written file
+        index_tmp = self._index_file.with_name(self._index_file.name + ".tmp")
+        if self.quantization == "binary":
+            faiss.write_index_binary(self.index, str(index_tmp))
+        else:
+            faiss.write_index(self.index, str(index_tmp))
+        meta = {
+            "quantization": self.quantization,
+            "ids": self._ids,
+            "documents": self._documents,
+            "metadatas": self._metadatas,
+            "pending": self._pending,
+            "section_counts": self._section_counts,
+        }
+        meta_tmp = self._meta_file.with_name(self._meta_file.name + ".tmp")
+        with open(meta_tmp, "wb") as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(index_tmp, self._index_file)
+        os.replace(meta_tmp, self._meta_file)
+    
+    @staticmethod
+    def _binarize(vectors: np.ndarray) -> np.ndarray:
+        """Pack sign bits, 8 dimensions per byte (sentence-transformers' 'ubinary' format)."""
+        return np.packbits(vectors > 0, axis=1)
+    
+    def _add_vectors(self, embeddings: np.ndarray):
+        if self.quantization == "binary":
+            self.index.add(self._binarize(embeddings))
+        elif self.quantization == "pq" and not self.index.is_trained:
+            self._pending = np.vstack([self._pending, embeddings])
+            if len(self._pending) >= self.PQ_TRAIN_SIZE:
+                # Train the codebooks on everything buffered so far, then replay it
+                self.index.train(self._pending)
+                self.index.add(self._pending)
+                self._pending = self._pending[:0]
+        else:
+            self.index.add(embeddings)
+    
+    def _search_vectors(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, cosine scores) for one normalized query."""
+        if len(self._pending):
+            # PQ not trained yet: every vector is still buffered, so search them exactly
+            scores = self._pending @ query[0]
+            rows = np.argsort(-scores)[:k]
+            return rows, scores[rows]
+        if self.quantization == "binary":
+            distances, rows = self.index.search(self._binarize(query), k)
+            return rows[0], 1 - distances[0] / self.embedding_model.dimensions
+        scores, rows = self.index.search(query, k)
+        return rows[0], scores[0]
     
     def add_chunks(self, chunks: list[TextChunk], show_progress: bool = True) -> int:
-        """Add text chunks to the vector store."""
-        if not chunks:
-            return 0
-        
-        ids = [chunk.chunk_id for chunk in chunks]
-        documents = [chunk.content for chunk in chunks]
-        metadatas = [
-            {
+        """Add text chunks to the vector store (ids already stored are skipped)."""
+        # One pass over the input collects ids, documents and metadata together;
+        # re-adding an existing id is a no-op, as it was with Chroma
+        with self._lock:
+            seen = set(self._rows)
+        ids, documents, metadatas = [], [], []
+        for chunk in chunks:
+            chunk_id = chunk.chunk_id
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            ids.append(chunk_id)
+            documents.append(chunk.content)
+            metadatas.append({
                 "source_file": chunk.source_file,
                 "section": chunk.section or "unknown",
                 "chunk_index": chunk.chunk_index,
                 "token_count": chunk.token_count,
-            }
-            for chunk in chunks
-        ]
+            })
+        if not ids:
+            return 0
         
         if show_progress:
-            print(f"Generating embeddings for {len(chunks)} chunks...")
+            print(f"Generating embeddings for {len(ids)} chunks...")
         
-        embedding_results = self.embedding_model.embed_batch(documents, show_progress=show_progress)
-        embeddings = [result.embedding for result in embedding_results]
+        # One batched encode for every chunk (outside the lock, so searches keep running);
+        # embed_texts returns L2-normalized rows, ready for the inner-product index
+        embeddings = self.embedding_model.embed_texts(documents, show_progress=show_progress)
         
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas
-        )
+        with self._lock:
+            # Drop ids another upload stored while this batch was being embedded
+            keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._rows]
+            if len(keep) < len(ids):
+                ids = [ids[i] for i in keep]
+                documents = [documents[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+                embeddings = embeddings[keep]
+                if not ids:
+                    return 0
+            
+            self._add_vectors(embeddings)
+            self._rows.update(zip(ids, range(len(self._ids), len(self._ids) + len(ids))))
+            self._ids.extend(ids)
+            self._documents.extend(documents)
+            self._metadatas.extend(metadatas)
+            self._section_counts.update(meta["section"] for meta in metadatas)
+            self._save()
         
         if show_progress:
-            print(f"✓ Added {len(chunks)} chunks to vector store")
+            print(f"✓ Added {len(ids)} chunks to vector store")
         
-        return len(chunks)
+        return len(ids)
     
     def search(
         self,
@@ -106,38 +277,51 @@ class VectorStore:
         filter_source: Optional[str] = None
     ) -> list[SearchResult]:
         """Search for similar chunks."""
-        where_filter = None
-        if filter_section or filter_source:
-            conditions = []
-            if filter_section:
-                conditions.append({"section": filter_section})
-            if filter_source:
-                conditions.append({"source_file": filter_source})
-            where_filter = conditions[0] if len(conditions) == 1 else {"$and": conditions}
-        
-        query_embedding = self.embedding_model.embed_query(query)
-        
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            where=where_filter,
-            include=["documents", "metadatas", "distances"]
-        )
+        if not self._ids:
+            return []
+        
+        # embed_query already returns a unit vector, so no normalize_L2 here
+        query_embedding = np.asarray([self.embedding_model.embed_query(query)], dtype=np.float32)
         
-        search_results = []
-        if results["ids"] and results["ids"][0]:
-            for i, chunk_id in enumerate(results["ids"][0]):
-                distance = results["distances"][0][i] if results["distances"] else 0
-                score = 1 - distance  # cosine similarity
-                
-                search_results.append(SearchResult(
-                    chunk_id=chunk_id,
-                    content=results["documents"][0][i],
-                    score=score,
-                    metadata=results["metadatas"][0][i] if results["metadatas"] else {}
-                ))
-        
-        return search_results
+        with self._lock:
+            return self._search_locked(query_embedding, n_results, filter_section, filter_source)
+    
+    def _search_locked(
+        self,
+        query_embedding: np.ndarray,
+        n_results: int,
+        filter_section: Optional[str],
+        filter_source: Optional[str]
+    ) -> list[SearchResult]:
+        # Row count and row lookups must come from the same state as the index search
+        total = len(self._ids)
+        if total == 0:
+            return []
+        
+        def matches(row: int) -> bool:
+            meta = self._metadatas[row]
+            return ((filter_section is None or meta["section"] == filter_section)
+                    and (filter_source is None or meta["source_file"] == filter_source))
+        
+        filtered = filter_section is not None or filter_source is not None
+        k = min(total, n_results * self.FILTER_OVERFETCH if filtered else n_results)
+        while True:
+            rows, scores = self._search_vectors(query_embedding, k)
+            hits = [(row, score) for row, score in zip(rows, scores) if row >= 0 and matches(row)]
+            # Widen the search until enough hits survive the filter or every row was considered
+            if len(hits) >= n_results or k >= total:
+                break
+            k = min(total, k * 4)
+        
+        return [
+            SearchResult(
+                chunk_id=self._ids[row],
+                content=self._documents[row],
+                score=float(score),  # cosine similarity
+                metadata=self._metadatas[row]
+            )
+            for row, score in hits[:n_results]
+        ]
     
     def search_by_section(self, query: str, section: str, n_results: int = 3) -> list[SearchResult]:
         """Search within a specific section."""
@@ -145,30 +329,32 @@ class VectorStore:
     
     def get_all_sections(self) -> list[str]:
         """Get all unique sections."""
-        results = self.collection.get(include=["metadatas"])
-        sections = set()
-        if results["metadatas"]:
-            for meta in results["metadatas"]:
-                if meta and "section" in meta:
-                    sections.add(meta["section"])
-        return sorted(list(sections))
+        with self._lock:
+            return sorted(self._section_counts)
     
     def get_chunk_count(self) -> int:
         """Get total chunks in store."""
-        return self.collection.count()
+        return len(self._ids)
     
     def clear(self):
         """Clear all documents."""
-        all_data = self.collection.get()
-        if all_data["ids"]:
-            self.collection.delete(ids=all_data["ids"])
-            print(f"✓ Cleared {len(all_data['ids'])} chunks")
+        with self._lock:
+            count = len(self._ids)
+            self.index = self._new_index()
+            self._ids, self._documents, self._metadatas, self._rows = [], [], [], {}
+            self._pending = self._pending[:0]
+            self._section_counts.clear()
+            self._save()
+        if count:
+            print(f"✓ Cleared {count} chunks")
 
 
 def create_vector_store(
     collection_name: str = "discharge_docs",
     persist_directory: Optional[str] = None,
-    use_medical_embeddings: bool = False
+    use_medical_embeddings: bool = False,
+    backend: str = "torch",
+    quantization: Literal["none", "pq", "binary"] = "none"
 ) -> VectorStore:
     """
     Factory function to create a vector store.
@@ -177,6 +363,8 @@ def create_vector_store(
         collection_name: Name for the collection
         persist_directory: Path to persist (None = in-memory)
         use_medical_embeddings: Use PubMedBERT embeddings
+        backend: Embedding backend ('torch', 'onnx' for CPU serving, 'openvino')
+        quantization: Stored vector format ('none', 'pq' 16x smaller, 'binary' 32x smaller)
     
     Examples:
         # Quick in-memory store
@@ -191,5 +379,7 @@ def create_vector_store(
     return VectorStore(
         collection_name=collection_name,
         persist_directory=persist_directory,
-        use_medical_embeddings=use_medical_embeddings
+        use_medical_embeddings=use_medical_embeddings,
+        embedding_backend=backend,
+        quantization=quantization
     )
\ No newline at end of file